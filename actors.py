@@ -12,7 +12,11 @@ class Actor:
 		""" Set size of the simulation world """
 		Actor._WORLD_SIZE = size
 
-	def __init__(self):
+	def __init__(self, params=None):
+		# Per-instance overrides of the class constants, e.g. {"_RADIUS": 10}
+		if params is not None:
+			for name, value in params.items():
+				setattr(self, name, value)
 		self.x = self.y = self.radians = 0
 		self.move_to_random()
 		self.radius = 1
@@ -75,6 +79,9 @@ class Agent(Actor):
 	_SIGHT_REACH = 60
 	# Multiplier on Prisoner's Dilemma reward for health effect
 	_PD_HEALTH_MULTIPLIER = 20
+	# Prisoner's Dilemma reward for (did attack, got attacked)
+	_PD_REWARD = {(True, True): -1, (False, True): -2,
+				  (True, False): 1, (False, False): 0}
 
 	@staticmethod
 	def create_random_brain():
@@ -162,20 +169,69 @@ class Agent(Actor):
 		return brain
 
 	@staticmethod
-	def mutate_brain(brain):
-		""" Add random mutations to a brain """
+	def mutate_brain(brain, odds=None, shift=None):
+		"""
+		Add random mutations to a brain. Mutation odds and shift default to the
+		Agent constants
+		"""
+		if odds is None:
+			odds = Agent._MUTATE_SYNAPSE_ODDS
+		if shift is None:
+			shift = Agent._MUTATE_SYNAPSE_SHIFT
 		# For all synapses: shift in some direction with random chance
 		for s in brain.synapses:
-			if util.rand(0, 1) <= Agent._MUTATE_SYNAPSE_ODDS:
-				s.weight += Agent._MUTATE_SYNAPSE_SHIFT * util.rand(-1, 1)
+			if util.rand(0, 1) <= odds:
+				s.weight += shift * util.rand(-1, 1)
 				s.weight = util.clamp(s.weight, -1, 1)
 
-	def __init__(self, generation, brain):
-		Actor.__init__(self)
-		self.radius = Agent._RADIUS
+	@staticmethod
+	def get_sensors_at(agents, actors, grid, radians, length, reach):
+		"""
+		Batched form of _get_sensor_at() computing one sensor for every Agent
+		in agents at once. Grid is a spatial.Grid over the positions of actors
+		so that only nearby Actors are checked. Return a list with a tuple
+		(sense, closest actor) per Agent
+		"""
+		reach_sqr = reach ** 2
+		results = []
+		for agent in agents:
+			# Compute sensor location
+			angle = agent.radians + radians
+			sensor_length = length + agent.radius
+			sensor_x = agent.x + math.cos(angle) * sensor_length
+			sensor_y = agent.y + math.sin(angle) * sensor_length
+			# Compute sensor value, visiting Actors in list order
+			sense = 0
+			closest = None
+			closest_dist = 0
+			for i in grid.query(sensor_x, sensor_y, reach):
+				actor = actors[i]
+				if actor is agent:
+					continue
+				dx = sensor_x - actor.x
+				dy = sensor_y - actor.y
+				dist_sqr = dx*dx + dy*dy
+				if dist_sqr > reach_sqr:
+					continue
+				dist = math.sqrt(dist_sqr)
+				if closest is None or dist < closest_dist:
+					closest = actor
+					closest_dist = dist
+				ratio = (reach - dist) / float(reach)
+				sense += ratio
+			results.append((sense, closest))
+		return results
+
+	def __init__(self, generation, brain, params=None):
+		Actor.__init__(self, params)
+		self.radius = self._RADIUS
 		self.turn_force = self.forward_force = 0
 		self.generation = generation
 		self.brain = brain
+		# Ticks lived across every generation; not cleared by reset()
+		self.age = 0
+		# Sum of Prisoner's Dilemma rewards from this generation's interactions
+		self.payoff = 0
 		# Map of every interaction from id(other Agent) to whether or not that
 		# Agent attacked during the previous encounter (True/False)
 		self.memory = {}
@@ -190,18 +246,26 @@ class Agent(Actor):
 		self.move_to_random()
 		self.health = 100
 		self.turn_force = self.forward_force = 0
+		self.payoff = 0
 		self.brain.reset()
 		self.memory.clear()
 		self.interact_agent = None
 		self.prev_interact_agent = None
 		self.interact_attacked = False
 
-	def on_tick(self, world_agents, world_food):
-		""" Update Agent state each tick of the simulation """
+	def on_tick(self, world_agents, world_food, sense_agents=True,
+				sense_food=True):
+		"""
+		Update Agent state each tick of the simulation. Pass sense_agents or
+		sense_food as False if those sensors were already set for this tick
+		"""
+		self.age += 1
 		# Neural network
 		self._update_hunger_sensor()
-		self._update_agent_sensors(world_agents)
-		self._update_food_sensors(world_food)
+		if sense_agents:
+			self._update_agent_sensors(world_agents)
+		if sense_food:
+			self._update_food_sensors(world_food)
 		self.brain.update()
 		# Movement
 		self._update_movement_forward()
@@ -209,45 +273,9 @@ class Agent(Actor):
 		self.move(math.cos(self.radians) * self.forward_force,
 				  math.sin(self.radians) * self.forward_force,
 				  self.turn_force)
-		# Attacking and eating
-		self._update_attack(world_agents)
+		# Eating; attacking is resolved for all Agents at once by the Model
 		self._update_food(world_food)
 
-	def process_attacks(self, model):
-		"""
-		Update status depending on what happened attack-wise last tick, then
-		reset attack status for the upcoming tick. Don't carry out the effect
-		of an attack if we're still interacting with the Agent we interacted
-		with during the previous tick
-		"""
-		other = self.interact_agent
-		if other is not None and other is not self.prev_interact_agent:
-			# Update health
-			did_attack = self.interact_attacked
-			got_attacked = other.interact_attacked
-			reward = 0
-			if did_attack and got_attacked:
-				# Defect-defect
-				reward = -1
-			elif not did_attack and got_attacked:
-				# Cooperate-defect
-				reward = -2
-			elif did_attack and not got_attacked:
-				# Defect-cooperate
-				reward = 1
-			self.health += reward * Agent._PD_HEALTH_MULTIPLIER
-			# Store into memory
-			self._remember_interaction(other, got_attacked)
-			self.prev_interact_agent = other
-			# Notify Model of event
-			if not did_attack and not got_attacked:
-				model.log_event("cc")
-			elif did_attack and got_attacked:
-				model.log_event("dd")
-			else:
-				model.log_event("cd")
-		self.interact_agent = None
-
 	def _update_hunger_sensor(self):
 		""" Update hunger input neuron in Agent brain according to health """
 		hunger = (100 - self.health) / 100.0
@@ -256,11 +284,29 @@ class Agent(Actor):
 
 	def _update_agent_sensors(self, world_agents):
 		""" Allow Agents to "see" nearby Agents and map to the brain """
-		rdn = Agent._SIGHT_ANGLE
-		lngth = Agent._SIGHT_LENGTH
-		rch = Agent._SIGHT_REACH
-		sight_lft, a_lft = self._get_sensor_at(world_agents, -rdn, lngth, rch)
-		sight_rght, a_rght = self._get_sensor_at(world_agents, rdn, lngth, rch)
+		rdn = self._SIGHT_ANGLE
+		lngth = self._SIGHT_LENGTH
+		rch = self._SIGHT_REACH
+		sight_lft = self._get_sensor_at(world_agents, -rdn, lngth, rch)
+		sight_rght = self._get_sensor_at(world_agents, rdn, lngth, rch)
+		self.set_agent_sensors(sight_lft, sight_rght)
+
+	def _update_food_sensors(self, world_food):
+		""" Allow Agents to "smell" nearby food and map to the brain """
+		rdn = self._SMELL_ANGLE
+		lngth = self._SMELL_LENGTH
+		rch = self._SMELL_REACH
+		scent_lft, a_lft = self._get_sensor_at(world_food, -rdn, lngth, rch)
+		scent_rght, a_rght = self._get_sensor_at(world_food, rdn, lngth, rch)
+		self.set_food_sensors(scent_lft, scent_rght)
+
+	def set_agent_sensors(self, sight_left, sight_right):
+		"""
+		Map left and right sight, each a tuple (sense, closest Agent), to the
+		brain
+		"""
+		sight_lft, a_lft = sight_left
+		sight_rght, a_rght = sight_right
 		self.brain.find_neuron("agnt_lft").energy = sight_lft
 		self.brain.find_neuron("agnt_rght").energy = sight_rght
 		# Modify neurons based on the history of the nearest Agent
@@ -269,15 +315,10 @@ class Agent(Actor):
 		if a_rght is not None and self._was_attacked_by(a_rght):
 			self.brain.find_neuron("agnt_rght").energy += 0.5
 
-	def _update_food_sensors(self, world_food):
-		""" Allow Agents to "smell" nearby food and map to the brain """
-		rdn = Agent._SMELL_ANGLE
-		lngth = Agent._SMELL_LENGTH
-		rch = Agent._SMELL_REACH
-		scent_lft, a_lft = self._get_sensor_at(world_food, -rdn, lngth, rch)
-		scent_rght, a_rght = self._get_sensor_at(world_food, rdn, lngth, rch)
-		self.brain.find_neuron("fd_lft").energy = scent_lft
-		self.brain.find_neuron("fd_rght").energy = scent_rght
+	def set_food_sensors(self, scent_left, scent_right):
+		""" Map left and right smell strength to the brain """
+		self.brain.find_neuron("fd_lft").energy = scent_left
+		self.brain.find_neuron("fd_rght").energy = scent_right
 
 	def _update_movement_forward(self):
 		""" Set desire to move forward by combining left/right movement neurons """
@@ -286,9 +327,9 @@ class Agent(Actor):
 		energy_right = self.brain.find_neuron("mv_rght").get_activation() / 2.0
 
 		# Compute desire to move forward
-		self.forward_force = (energy_left + energy_right) * Agent._FORWARD_SPEED
+		self.forward_force = (energy_left + energy_right) * self._FORWARD_SPEED
 		self.forward_force = util.clamp(self.forward_force, 0,
-										Agent._FORWARD_MAX)
+										self._FORWARD_MAX)
 
 	def _update_movement_turn(self):
 		""" Set desire to turn by combining left/right movement neurons """
@@ -297,41 +338,14 @@ class Agent(Actor):
 		energy_right = self.brain.find_neuron("mv_rght").get_activation()
 
 		# Compute desire to turn
-		self.turn_force = (energy_right - energy_left) * Agent._TURN_SPEED
-		self.turn_force = util.clamp(self.turn_force, -Agent._TURN_MAX,
-									 Agent._TURN_MAX)
+		self.turn_force = (energy_right - energy_left) * self._TURN_SPEED
+		self.turn_force = util.clamp(self.turn_force, -self._TURN_MAX,
+									 self._TURN_MAX)
 
-	def _update_attack(self, world_agents):
-		"""
-		Allow Agents to attack other Agents and store the result of the
-		interaction
-		"""
-		# If we've interacted with an Agent this tick then don't do so again
-		if self.interact_agent is not None:
-			return
-		attack_dist_sqr = (self.radius * 2) ** 2
-		for other in world_agents:
-			# Can we interact with this Agent?
-			if other is self or other.interact_agent is not None:
-				continue
-			dist_sqr = util.dist_sqr(self.get_pos(), other.get_pos())
-			if dist_sqr > attack_dist_sqr:
-				continue
-			# Execute interaction between self and other
-			self.interact_agent = other
-			other.interact_agent = self
-			if other is not self.prev_interact_agent:
-				self.interact_attacked = self._will_attack()
-				other.interact_attacked = other._will_attack()
-			break
-		if self.interact_agent is None:
-			self.interact_attacked = False
-
-	def _will_attack(self):
-		""" Determine if this Agent will attack another in an interaction """
+	def get_attack_odds(self):
+		""" Probability that this Agent will attack another in an interaction """
 		prob = self.brain.find_neuron("atk").get_activation()
-		prob = util.clamp(prob, 0, 1)
-		return util.rand(0, 1) <= prob
+		return util.clamp(prob, 0, 1)
 
 	def _update_food(self, world_food):
 		""" Allow Agents to eat Food objects """
@@ -340,11 +354,11 @@ class Agent(Actor):
 			this_dist = util.dist(self.get_pos(), food.get_pos())
 			max_dist = self.radius + food.radius
 			if this_dist <= max_dist and food.is_alive():
-				self.health += food.eat()
+				self.health += food.eat(self)
 				return
 		# If no food was eaten the Agent is hungry
-		self.health -= (self.forward_force * Agent._HUNGER_MOVEMENT_RATIO +
-						Agent._HUNGER_PER_TICK)
+		self.health -= (self.forward_force * self._HUNGER_MOVEMENT_RATIO +
+						self._HUNGER_PER_TICK)
 
 	def _get_sensor_at(self, actors, radians, length, reach):
 		"""
@@ -376,7 +390,7 @@ class Agent(Actor):
 			sense += ratio
 		return (sense, closest)
 
-	def _remember_interaction(self, other, other_attacked):
+	def remember_interaction(self, other, other_attacked):
 		""" Store the memory of an interaction with another Agent """
 		key = id(other)
 		self.memory[key] = other_attacked
@@ -396,11 +410,14 @@ class Food(Actor):
 	_ENERGY = 50
 	_RADIUS = 5
 
-	def __init__(self):
-		Actor.__init__(self)
-		self.radius = Food._RADIUS
+	def __init__(self, params=None):
+		Actor.__init__(self, params)
+		self.radius = self._RADIUS
+		# Agent that ate this Food, if any
+		self.eaten_by = None
 
-	def eat(self):
+	def eat(self, agent=None):
 		""" Called when an Agent eats a Food object. Returns energy gained """
 		self.health = 0
-		return Food._ENERGY
+		self.eaten_by = agent
+		return self._ENERGY
@@ -1,3 +1,5 @@
+import actors
+import genome_bank
 import math
 import model
 import sys
@@ -5,28 +7,51 @@ import util
 
 
 class ConsoleApp:
+	# Command line options, given as --name or --name=value
+	_OPTIONS = ["genome-bank", "genome-stats", "memory", "telemetry"]
+
 	def __init__(self, argc, argv):
 		# Command line arguments
-		if argc != 2 or int(argv[1]) <= 0:
+		args = [arg for arg in argv if not arg.startswith("--")]
+		self.options = {}
+		for arg in argv:
+			if arg.startswith("--"):
+				name, _, value = arg[2:].partition("=")
+				self.options[name] = value
+		if (len(args) != 2 or int(args[1]) <= 0 or
+				not set(self.options) <= set(ConsoleApp._OPTIONS)):
 			self.print_usage(argv)
 			exit()
-		self.max_generation = int(argv[1])
+		self.max_generation = int(args[1])
 		self.is_running = False
 		self.size = (1024, 768)
 		self.model = None
+		self.genome_bank = None
  
  	def print_usage(self, argv):
  		""" Print command line argument info to standard output """
- 		print "usage: python %s max_generation" % argv[0]
+ 		print ("usage: python %s max_generation [--genome-bank=path]"
+ 			   " [--genome-stats=path] [--memory] [--telemetry]" % argv[0])
 
 	def on_init(self):
-		""" Nothing to do """
-		pass
+		""" Open the genome bank, if any, creating it when it doesn't exist """
+		path = self.options.get("genome-bank")
+		if path:
+			brain = actors.Agent.create_random_brain()
+			self.genome_bank = genome_bank.GenomeBank(path,
+				brain.get_topology(), len(brain.synapses))
 
 	def on_execute(self):
 		""" Run the simulation until the user quits or reach max_generation """
 		self.is_running = True
-		self.model = model.Model(self.size)
+		self.model = model.Model(self.size, genome_bank=self.genome_bank)
+		if "memory" in self.options:
+			self.model.watch_memory()
+		if "telemetry" in self.options:
+			self.model.watch_telemetry()
+		path = self.options.get("genome-stats")
+		if path:
+			self.model.watch_genomes(path)
 		current_generation = 0
 
 		while(self.is_running):
@@ -40,6 +65,24 @@ class ConsoleApp:
 	def on_exit(self):
 		""" Model outputs results """
 		self.model.on_exit()
+		if "memory" in self.options:
+			print "---> Memory use per generation"
+			print self.model.memory_monitor.report()
+			self.model.memory_monitor.stop()
+		if "telemetry" in self.options:
+			print "---> Per-tick telemetry"
+			print self.model.telemetry.report()
+		if self.options.get("genome-stats"):
+			print "---> Genome diversity per generation"
+			for generation, diversity, shift in self.model.genome_log.summary:
+				print "%10d  diversity %8.4f  centroid shift %s" % (
+					generation, diversity,
+					"-" if shift is None else "%.4f" % shift)
+			self.model.genome_log.close()
+		if self.genome_bank is not None:
+			print "Genome bank:        %d genomes in %s" % (
+				len(self.genome_bank), self.genome_bank.path)
+			self.genome_bank.close()
 
 
 if __name__ == "__main__" :
@@ -0,0 +1,23 @@
+import collections
+
+# Events a Model delivers to its subscribers; see Model.subscribe(). Every
+# event carries the generation and tick it happened in
+
+# An Agent was created for a new generation (survivors aren't reborn)
+AgentBorn = collections.namedtuple("AgentBorn", "generation tick agent")
+# An Agent's health ran out, or it was culled when the generation hit its
+# tick cap (culled is then True)
+AgentDied = collections.namedtuple("AgentDied",
+								   "generation tick agent culled")
+# An Agent ate a piece of Food
+FoodEaten = collections.namedtuple("FoodEaten", "generation tick agent food")
+# The outcome of a new interaction as seen by one Agent. Each interaction
+# produces one event per Agent taking part
+InteractionResolved = collections.namedtuple("InteractionResolved",
+	"generation tick agent other attacked other_attacked reward")
+# A generation of Agents and Food was created
+GenerationStarted = collections.namedtuple("GenerationStarted",
+										   "generation tick agents")
+# A tick was simulated; alive is the number of living Agents at its end
+TickCompleted = collections.namedtuple("TickCompleted",
+									   "generation tick alive")
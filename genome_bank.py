@@ -0,0 +1,148 @@
+import mmap
+import os
+import struct
+
+
+class GenomeBank:
+	"""
+	Append-only file of NeuralNetwork synapse weights. Every genome in a bank
+	shares one topology, stored once in the header, and is stored as a
+	fixed-size binary record (run, generation, lifetime, weights...) so that
+	genomes can be read straight out of a memory map without any parsing
+	"""
+	_MAGIC = "GBNK"
+	_VERSION = 1
+	# Magic, version, weights per genome, genome count, run count, topology
+	# length; the topology string follows and is padded to 8 bytes
+	_HEADER = struct.Struct("<4sIIQII")
+	# Run, generation, and lifetime at the start of every record
+	_METADATA = struct.Struct("<qii")
+
+	def __init__(self, path, topology=None, weight_count=None):
+		"""
+		Open the bank at path. If the file doesn't exist it is created for
+		genomes with the given topology string and number of weights, e.g. from
+		NeuralNetwork.get_topology() and len(NeuralNetwork.synapses)
+		"""
+		self.path = path
+		if not os.path.exists(path):
+			if topology is None or weight_count is None:
+				raise ValueError("New genome bank needs a topology: %s" % path)
+			self._create(topology, weight_count)
+		self.file = open(path, "r+b")
+		self.map = None
+		header = self.file.read(GenomeBank._HEADER.size)
+		magic, version, self.weight_count, self.count, self.run_count, \
+			topology_len = GenomeBank._HEADER.unpack(header)
+		if magic != GenomeBank._MAGIC or version != GenomeBank._VERSION:
+			raise ValueError("Not a version %d genome bank: %s" %
+							 (GenomeBank._VERSION, path))
+		self.topology = self.file.read(topology_len)
+		if topology is not None and topology != self.topology:
+			raise ValueError("Genome bank topology mismatch: %s" % path)
+		self.offset = GenomeBank._HEADER.size + topology_len
+		self.offset += -self.offset % 8
+		self.record = struct.Struct(GenomeBank._METADATA.format +
+									"%dd" % self.weight_count)
+		self._remap()
+
+	def __len__(self):
+		return self.count
+
+	def close(self):
+		""" Release the memory map and the file """
+		if self.map is not None:
+			self.map.close()
+			self.map = None
+		self.file.close()
+
+	def new_run(self):
+		""" Reserve and return an id to tag the genomes of one run with """
+		run = self.run_count
+		self.run_count += 1
+		self._write_header()
+		return run
+
+	def append(self, weights, run=0, generation=0, lifetime=0):
+		""" Add a single genome """
+		self.append_many([(weights, run, generation, lifetime)])
+
+	def append_many(self, genomes):
+		"""
+		Add every genome from an iterable of (weights, run, generation,
+		lifetime) tuples with a single write
+		"""
+		record = self.record
+		data = []
+		for weights, run, generation, lifetime in genomes:
+			if len(weights) != self.weight_count:
+				raise ValueError("Expected %d weights, got %d" %
+								 (self.weight_count, len(weights)))
+			data.append(record.pack(run, generation, lifetime, *weights))
+		self._append_records("".join(data), len(data))
+
+	def import_bank(self, other):
+		""" Append every genome of another bank with the same topology """
+		if other.topology != self.topology:
+			raise ValueError("Genome bank topology mismatch: %s" % other.path)
+		start = other.offset
+		end = start + other.count * other.record.size
+		if end > start:
+			self._append_records(other.map[start:end], other.count)
+
+	def get_genome(self, index):
+		""" Return a tuple (weights, run, generation, lifetime) """
+		if index < 0 or index >= self.count:
+			raise IndexError("Genome index out of range: %d" % index)
+		values = self.record.unpack_from(self.map,
+										 self.offset + index * self.record.size)
+		return (list(values[3:]), values[0], values[1], values[2])
+
+	def get_weights(self, index):
+		""" Return the weights of one genome as a list """
+		return self.get_genome(index)[0]
+
+	def iter_genomes(self):
+		""" Iterate over (weights, run, generation, lifetime) of every genome """
+		for index in range(self.count):
+			yield self.get_genome(index)
+
+	def sample(self, rng):
+		""" Return the weights of a genome chosen uniformly using rng """
+		if self.count == 0:
+			raise IndexError("Cannot sample from an empty genome bank")
+		return self.get_weights(rng.randrange(self.count))
+
+	def _create(self, topology, weight_count):
+		""" Write the header of a new, empty bank """
+		header = GenomeBank._HEADER.pack(GenomeBank._MAGIC, GenomeBank._VERSION,
+										 weight_count, 0, 0, len(topology))
+		header += topology
+		header += "\0" * (-len(header) % 8)
+		with open(self.path, "wb") as f:
+			f.write(header)
+
+	def _write_header(self):
+		""" Store the current counts in the header """
+		self.file.seek(0)
+		self.file.write(GenomeBank._HEADER.pack(GenomeBank._MAGIC,
+			GenomeBank._VERSION, self.weight_count, self.count, self.run_count,
+			len(self.topology)))
+		self.file.flush()
+
+	def _append_records(self, data, count):
+		""" Write packed records after the last genome and update the count """
+		self.file.seek(self.offset + self.count * self.record.size)
+		self.file.write(data)
+		self.count += count
+		self._write_header()
+		self._remap()
+
+	def _remap(self):
+		""" Memory-map the file again after it has grown """
+		if self.map is not None:
+			self.map.close()
+			self.map = None
+		self.file.seek(0, os.SEEK_END)
+		if self.file.tell() > 0:
+			self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
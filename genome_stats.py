@@ -0,0 +1,75 @@
+import json
+import math
+
+
+def compute_genome_stats(weights, bins=16, low=-1.0, high=1.0):
+	"""
+	Return a dict of statistics of a population given its weight matrix (one
+	row of Synapse weights per genome): the mean, variance, and histogram of
+	every Synapse, and diversity, the mean squared distance between two
+	distinct genomes. Histograms count weights in bins equal parts of
+	[low, high), by default the range mutation clamps weights to; weights
+	outside the range go to the end bins
+	"""
+	count = len(weights)
+	columns = zip(*weights)
+	means = [sum(column) / count for column in columns]
+	variances = [sum([(w - mean) ** 2 for w in column]) / count
+				 for column, mean in zip(columns, means)]
+	width = (high - low) / bins
+	histograms = []
+	for column in columns:
+		histogram = [0] * bins
+		for w in column:
+			histogram[min(max(int((w - low) // width), 0), bins - 1)] += 1
+		histograms.append(histogram)
+	# Mean squared distance over all pairs is twice the total variance, so
+	# diversity doesn't need every pair of genomes
+	diversity = 0.0
+	if count > 1:
+		diversity = 2.0 * sum(variances) * count / (count - 1)
+	return {"agents": count, "mean": means, "variance": variances,
+			"histogram": histograms, "histogram_range": [low, high],
+			"diversity": diversity}
+
+
+class GenomeLog:
+	"""
+	Computes genome statistics of the surviving Agents of every generation,
+	plus how far the population centroid moved since the previous generation,
+	and streams each as a line of JSON to a file. Only diversity and centroid
+	shift are kept in memory
+	"""
+	def __init__(self, path=None, bins=16, low=-1.0, high=1.0):
+		self.path = path
+		self.bins = bins
+		self.low = low
+		self.high = high
+		self.stream = open(path, "a") if path is not None else None
+		self.previous_mean = None
+		# List of (generation, diversity, centroid shift or None)
+		self.summary = []
+
+	def record(self, generation, agents):
+		""" Compute, save, and return the statistics of agents, or None """
+		if len(agents) == 0:
+			return None
+		weights = [agent.brain.get_weights() for agent in agents]
+		stats = compute_genome_stats(weights, self.bins, self.low, self.high)
+		shift = None
+		if self.previous_mean is not None:
+			shift = math.sqrt(sum([(a - b) ** 2 for a, b in
+								   zip(stats["mean"], self.previous_mean)]))
+		self.previous_mean = stats["mean"]
+		stats["generation"] = generation
+		stats["centroid_shift"] = shift
+		self.summary.append((generation, stats["diversity"], shift))
+		if self.stream is not None:
+			self.stream.write(json.dumps(stats, sort_keys=True) + "\n")
+			self.stream.flush()
+		return stats
+
+	def close(self):
+		if self.stream is not None:
+			self.stream.close()
+			self.stream = None
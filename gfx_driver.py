@@ -2,17 +2,35 @@ import math
 import model
 import pygame
 import sys
+import telemetry
 import util
 
 
 class GraphicsApp:
-	# Frames per second for each speed toggle
-	_FPS_SLOW = 10
-	_FPS_NORMAL = 40
-	_FPS_FAST = 160
-	_FPS_REALTIME = 0
+	# Display frames per second; the simulation runs as many ticks between
+	# frames as its speed asks for and the frame budget allows
+	_FRAME_RATE = 40
+	# Simulation ticks per second for each speed toggle (0 is unlimited)
+	_SPEED_SLOW = 10
+	_SPEED_NORMAL = 40
+	_SPEED_FAST = 160
+	_SPEED_10X = 400
+	_SPEED_100X = 4000
+	_SPEED_1000X = 40000
+	_SPEED_REALTIME = 0
+	# Keys that select each speed and how it is described on screen
+	_SPEED_KEYS = [(pygame.K_1, _SPEED_SLOW, "slow"),
+				   (pygame.K_2, _SPEED_NORMAL, "normal"),
+				   (pygame.K_3, _SPEED_FAST, "fast"),
+				   (pygame.K_4, _SPEED_REALTIME, "real-time"),
+				   (pygame.K_5, _SPEED_10X, "10x"),
+				   (pygame.K_6, _SPEED_100X, "100x"),
+				   (pygame.K_7, _SPEED_1000X, "1000x")]
 	# Keycode for pygame left mouse button (pygame doesn't have one defined)
 	_PYGAME_MOUSE_LEFT = 1
+	# Size of each telemetry sparkline; it shows the latest width ticks
+	_SPARK_WIDTH = 120
+	_SPARK_HEIGHT = 24
 
 	def __init__(self, argc, argv):
 		# Command line arguments
@@ -24,8 +42,17 @@ class GraphicsApp:
 		self.size = (1024, 768)
 		self.title = "Evolution of Cooperation"
 		self.buffer = None
+		# Scheduling: ticks still owed to the simulation, duration of the last
+		# render (ms), and measured ticks per second
+		self.speed = GraphicsApp._SPEED_NORMAL
+		self.clock = None
+		self.last_frame = 0
+		self.tick_debt = 0.0
+		self.render_time = 0
+		self.rate_start = 0
+		self.rate_ticks = 0
+		self.tick_rate = 0
 		# Misc
-		self.fps = GraphicsApp._FPS_NORMAL
 		self.is_running = False
 		self.model = None
 
@@ -45,26 +72,29 @@ class GraphicsApp:
 		print "Controls:"
 		print "   q   quit"
 		print "   r   reset model"
-		print "   1   slow speed"
-		print "   2   normal speed"
-		print "   3   fast speed"
-		print "   4   real-time"
+		print "   1   slow speed (%d ticks/s)" % GraphicsApp._SPEED_SLOW
+		print "   2   normal speed (%d ticks/s)" % GraphicsApp._SPEED_NORMAL
+		print "   3   fast speed (%d ticks/s)" % GraphicsApp._SPEED_FAST
+		print "   4   real-time (as fast as possible)"
+		print "   5   10x normal speed"
+		print "   6   100x normal speed"
+		print "   7   1000x normal speed"
 		print "Click on an Agent to view its neural network in real time"
 
 	def on_execute(self):
 		""" Run the simulation until the user quits or reach max_generation """
 		self.is_running = True
 		self.model = model.Model(self.size)
+		self.model.watch_telemetry(GraphicsApp._SPARK_WIDTH)
 		self.focus_agent = None
+		self.clock = pygame.time.Clock()
+		self.last_frame = self.rate_start = pygame.time.get_ticks()
 
 		while(self.is_running):
 			for event in pygame.event.get():
 				self._on_event(event)
-			self.model.on_tick()
-			if self.fps > 0:
-				self._on_render()
-			if self.model.generation == self.max_generation + 1:
-				self.is_running = False
+			self._run_ticks()
+			self._on_render()
 
 	def on_exit(self):
 		""" Quit out of the pygame module """
@@ -79,19 +109,14 @@ class GraphicsApp:
 			if event.key == pygame.K_r:
 				# Start over with a fresh Model
 				self.model = model.Model(self.size)
+				self.model.watch_telemetry(GraphicsApp._SPARK_WIDTH)
 				self.focus_agent = None
-			elif event.key == pygame.K_1:
-				self.fps = GraphicsApp._FPS_SLOW
-			elif event.key == pygame.K_2:
-				self.fps = GraphicsApp._FPS_NORMAL
-			elif event.key == pygame.K_3:
-				self.fps = GraphicsApp._FPS_FAST
-			elif event.key == pygame.K_4:
-				self.fps = GraphicsApp._FPS_REALTIME
-				# Render the screen one more time so the user knows the FPS
-				self._on_render()
 			elif event.key == pygame.K_q:
 				self.is_running = False
+			for key, speed, name in GraphicsApp._SPEED_KEYS:
+				if event.key == key:
+					self.speed = speed
+					self.tick_debt = 0.0
 		elif event.type == pygame.MOUSEBUTTONDOWN:
 			if event.button == GraphicsApp._PYGAME_MOUSE_LEFT:
 				self.focus_agent = None
@@ -101,17 +126,55 @@ class GraphicsApp:
 						self.focus_agent = agent
 						break
 
+	def _run_ticks(self):
+		"""
+		Advance the simulation by the number of ticks its speed calls for since
+		the last frame. Stop early once the frame budget left after rendering
+		runs out so that the window stays responsive; the simulation then runs
+		slower than asked
+		"""
+		now = pygame.time.get_ticks()
+		elapsed = now - self.last_frame
+		self.last_frame = now
+		period = 1000.0 / GraphicsApp._FRAME_RATE
+		deadline = now + period - self.render_time
+		if self.speed > 0:
+			# Never owe more than two frames' worth of ticks
+			self.tick_debt += self.speed * elapsed / 1000.0
+			self.tick_debt = min(self.tick_debt, self.speed * period / 500.0)
+		ticks = 0
+		while self.is_running:
+			if self.speed > 0 and self.tick_debt < 1:
+				break
+			if ticks > 0 and pygame.time.get_ticks() >= deadline:
+				# Out of time: drop what is still owed
+				self.tick_debt = 0.0
+				break
+			self.model.on_tick()
+			self.tick_debt -= 1
+			ticks += 1
+			if self.model.generation == self.max_generation + 1:
+				self.is_running = False
+		# Measure the actual simulation speed about once a second
+		self.rate_ticks += ticks
+		if now - self.rate_start >= 1000:
+			self.tick_rate = self.rate_ticks * 1000 // (now - self.rate_start)
+			self.rate_start = now
+			self.rate_ticks = 0
+
 	def _on_render(self):
 		""" Render world and information to the screen """
+		start = pygame.time.get_ticks()
 		self._draw_background()
 		self._draw_food()
 		self._draw_agents()
 		self._draw_info()
+		self._draw_telemetry()
 		self._draw_focus()
-		# Show screen and slow down program
+		# Show screen and wait out the rest of the frame
 		pygame.display.flip()
-		if self.fps > 0:
-			pygame.time.Clock().tick(self.fps)
+		self.render_time = pygame.time.get_ticks() - start
+		self.clock.tick(GraphicsApp._FRAME_RATE)
 
 	def _draw_background(self):
 		""" Clear the screen with white """
@@ -163,19 +226,45 @@ class GraphicsApp:
 		content = "generation: %d   tick: %d" % self.model.get_gen_tick()
 		text = font.render(content, False, black)
 		self.buffer.blit(text, (5, 5))
-		# Simulation speed
+		# Simulation speed, as set and as achieved
 		content = ""
-		if self.fps == GraphicsApp._FPS_SLOW:
-			content = "speed: slow"
-		elif self.fps == GraphicsApp._FPS_NORMAL:
-			content = "speed: normal"
-		elif self.fps == GraphicsApp._FPS_FAST:
-			content = "speed: fast"
-		elif self.fps == GraphicsApp._FPS_REALTIME:
-			content = "speed: real-time"
+		for key, speed, name in GraphicsApp._SPEED_KEYS:
+			if self.speed == speed:
+				content = "speed: %s" % name
+		content += "   (%d ticks/s)" % self.tick_rate
 		text = font.render(content, False, black)
 		self.buffer.blit(text, (5, 25))
 
+	def _draw_telemetry(self):
+		"""
+		Draw a sparkline of the recent history of every telemetry statistic in
+		the top right corner, each scaled to its own range
+		"""
+		if self.model.telemetry is None:
+			return
+		black = pygame.Color(0,0,0)
+		blue = pygame.Color(100,100,200)
+		font = pygame.font.Font(None, 16)
+		width = GraphicsApp._SPARK_WIDTH
+		height = GraphicsApp._SPARK_HEIGHT
+		left = self.size[0] - width - 5
+		top = 5
+		for name in telemetry.Telemetry.NAMES:
+			values = self.model.telemetry.get(name)[-width:]
+			content = "%s: %.2f" % (name, values[-1] if values else 0.0)
+			text = font.render(content, False, black)
+			self.buffer.blit(text, (left, top))
+			top += 12
+			pygame.draw.rect(self.buffer, black, (left, top, width, height), 1)
+			if len(values) > 1:
+				low = min(values)
+				span = max(values) - low or 1.0
+				points = [(left + i, top + height - 1 -
+						   (value - low) / span * (height - 2))
+						  for i, value in enumerate(values)]
+				pygame.draw.lines(self.buffer, blue, False, points, 1)
+			top += height + 4
+
 	def _draw_focus(self):
 		"""
 		Draw the neural network of the currently-selected Agent (if any). Very
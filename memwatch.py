@@ -0,0 +1,143 @@
+import gc
+import sys
+
+try:
+	import tracemalloc
+except ImportError:
+	# Python 2 has no tracemalloc; totals are then left out of samples
+	tracemalloc = None
+
+
+def sizeof_object(obj):
+	""" Bytes used by an object and its attribute dict, but not its values """
+	size = sys.getsizeof(obj)
+	if hasattr(obj, "__dict__"):
+		size += sys.getsizeof(obj.__dict__)
+	return size
+
+
+def sizeof_brain(brain):
+	""" Bytes used by a NeuralNetwork with its Neurons and Synapses """
+	size = sizeof_object(brain)
+	size += sys.getsizeof(brain.neurons) + sys.getsizeof(brain.synapses)
+	for component in brain.neurons + brain.synapses:
+		size += sizeof_object(component)
+	if brain.cache is not None:
+		size += sizeof_object(brain.cache)
+		for entries in (brain.cache.entries, brain.cache.previous):
+			size += sys.getsizeof(entries)
+			for key, outcome in entries.items():
+				size += sys.getsizeof(key) + sys.getsizeof(outcome)
+	return size
+
+
+def sizeof_agent(agent):
+	""" Bytes used by an Agent and its memory, excluding its brain """
+	size = sizeof_object(agent) + sys.getsizeof(agent.memory)
+	for key in agent.memory:
+		size += sys.getsizeof(key)
+	return size
+
+
+def sizeof_list(values):
+	""" Bytes used by a flat list and its items """
+	return sys.getsizeof(values) + sum([sys.getsizeof(v) for v in values])
+
+
+class MemoryMonitor:
+	"""
+	Samples memory use of a Model at the end of every generation and flags
+	measures that keep growing. Each sample is a dict of measure name to value:
+	average bytes per Agent, Food, and brain; total Agent memory entries;
+	bytes held by the Model logs; live object counts by type; and total traced
+	bytes when tracemalloc is available
+	"""
+	# Types whose live instances are counted
+	_COUNTED_TYPES = ["Agent", "Food", "NeuralNetwork", "Neuron", "Synapse",
+					  "dict", "list"]
+
+	def __init__(self, window=5):
+		# Growth over window consecutive samples is flagged
+		self.window = window
+		self.samples = []
+		self.generations = []
+		self.started_tracing = False
+		if tracemalloc is not None and not tracemalloc.is_tracing():
+			tracemalloc.start()
+			self.started_tracing = True
+
+	def stop(self):
+		""" Stop tracing allocations, if this monitor started it """
+		if self.started_tracing:
+			tracemalloc.stop()
+			self.started_tracing = False
+
+	def sample(self, model):
+		""" Record measures for the current state of model """
+		agents = model.agents
+		food = model.food
+		sample = {}
+		sample["bytes_per_agent"] = self._average(sizeof_agent, agents)
+		sample["bytes_per_food"] = self._average(sizeof_object, food)
+		sample["bytes_per_brain"] = self._average(sizeof_brain,
+			[agent.brain for agent in agents])
+		sample["memory_entries"] = sum([len(a.memory) for a in agents])
+		sample["log_bytes"] = sum([sizeof_list(log) for log in
+								   model.get_results().values()])
+		sample.update(self._count_objects())
+		if tracemalloc is not None:
+			sample["traced_bytes"] = tracemalloc.get_traced_memory()[0]
+		self.samples.append(sample)
+		self.generations.append(model.generation)
+
+	def get_growing(self):
+		"""
+		Return the sorted names of measures that increased in every one of the
+		last window samples
+		"""
+		if len(self.samples) <= self.window:
+			return []
+		recent = self.samples[-(self.window + 1):]
+		growing = []
+		for name in sorted(recent[-1]):
+			values = [sample.get(name, 0) for sample in recent]
+			if all([b > a for a, b in zip(values, values[1:])]):
+				growing.append(name)
+		return growing
+
+	def report(self):
+		""" Return a human-readable table of every sample """
+		if len(self.samples) == 0:
+			return "No memory samples"
+		names = sorted(self.samples[-1])
+		lines = ["generation  " + "  ".join(names)]
+		for generation, sample in zip(self.generations, self.samples):
+			values = ["%*d" % (len(name), sample.get(name, 0))
+					  for name in names]
+			lines.append("%10d  " % generation + "  ".join(values))
+		growing = self.get_growing()
+		if len(growing) > 0:
+			lines.append("Growing over %d generations: %s" %
+						 (self.window, ", ".join(growing)))
+		return "\n".join(lines)
+
+	def _average(self, sizeof, objects):
+		""" Average size of objects in bytes, or 0 if there are none """
+		if len(objects) == 0:
+			return 0
+		return sum([sizeof(obj) for obj in objects]) // len(objects)
+
+	def _count_objects(self):
+		"""
+		Count live objects of the counted types. Collect first so that
+		unreachable cycles (e.g. Agents that interacted) aren't counted
+		"""
+		gc.collect()
+		counts = dict([("count_" + name, 0)
+					   for name in MemoryMonitor._COUNTED_TYPES])
+		for obj in gc.get_objects():
+			# Old-style class instances report their class through __class__
+			name = "count_" + getattr(obj, "__class__", type(obj)).__name__
+			if name in counts:
+				counts[name] += 1
+		return counts
@@ -1,5 +1,17 @@
 import actors
+import bisect
+import cPickle
+import events
+import genome_stats
+import memwatch
+import nnet
+import os
 import random
+import spatial
+import sys
+import telemetry
+import traceback
+import util
 
 
 class Model:
@@ -8,10 +20,63 @@ class Model:
 	_SURVIVOR_PERCENT = 0.25
 	# Number of Food objects in the simulation per Agent object
 	_FOOD_PER_AGENT = 1.0
+	# Let Agents see each other where they stood at the start of the tick
+	# rather than where they are on their turn, so that sight can be computed
+	# for every Agent in one pass. Faster, but changes the dynamics
+	_SYNC_SIGHT = False
+	# Experimental: number of update() outcomes each Agent brain remembers
+	# (0 disables) and the rounding applied to Neuron energies when looking
+	# them up. An exact cache (quantum 0) almost never hits because hunger
+	# changes every tick, and rounding changes the dynamics
+	_BRAIN_CACHE_SIZE = 0
+	_BRAIN_CACHE_QUANTUM = 0.05
+	# Optional cap on the ticks of a generation (0 disables). A generation that
+	# reaches it ends early with the fittest living Agents as survivors and its
+	# lifetime is logged as censored
+	_GENERATION_TICKS = 0
+	# Optional pre-screening of new brains (0 disables): each new Agent's
+	# brain must eat within _SCREEN_TICKS ticks of foraging alone or it is
+	# resampled, at most _SCREEN_RETRIES times. Must be below the ticks an
+	# Agent that never eats takes to starve (~170 by default), as screening
+	# would otherwise cost more than it saves; set_params() raises ValueError
+	# if it isn't. Around 30 to 60 works best: shorter also rejects slow but
+	# capable foragers
+	_SCREEN_TICKS = 0
+	_SCREEN_RETRIES = 3
+	# Event logged for an interaction by (did attack, got attacked)
+	_PD_EVENT = {(True, True): "dd", (False, True): "cd",
+				 (True, False): "cd", (False, False): "cc"}
 
-	def __init__(self, size):
+	def __init__(self, size, params=None, seed=None, genome_bank=None):
 		self.size = size[:]
-		actors.Actor.set_world_size(self.size[:])
+		# Overrides of Model, Agent, and Food constants for this Model only
+		self.params = {}
+		self._agent_params = {}
+		self._food_params = {}
+		self.set_params(params or {})
+		# Every Model draws from its own stream of pseudo-random numbers
+		self.random = random.Random(seed)
+		self.activate()
+		# Hit rate of the brain caches of every Agent in this Model
+		self.brain_cache_stats = nnet.CacheStats()
+		# GenomeBank the initial generation is sampled from (if not empty) and
+		# the survivors of every generation are appended to
+		self.genome_bank = genome_bank
+		if genome_bank is not None:
+			self._bank_run = genome_bank.new_run()
+		# Per-generation dicts of pre-screening statistics; see _screen_agents()
+		self.screen_log = []
+		# MemoryMonitor sampled at the end of every generation; see watch_memory()
+		self.memory_monitor = None
+		# Telemetry sampled at the end of every tick; see watch_telemetry()
+		self.telemetry = None
+		# GenomeLog fed the survivors of every generation; see watch_genomes()
+		self.genome_log = None
+		# List of (observer, event types or None, batched) and the events of
+		# the current tick; the list is None while there are no observers so
+		# that every hook costs a single check
+		self._observers = []
+		self._event_batch = None
 		self.agents = []
 		self.food = []
 		self.tick = self.generation = 0
@@ -20,109 +85,614 @@ class Model:
 		self._log_cd = [0]
 		self._log_dd = [0]
 		self._log_event = [0]
+		self._log_censored = [0]
 
 	def on_tick(self):
 		"""
 		Called once every step of the simulation. Update Agents, Food, and
 		internal state
 		"""
+		self.activate()
 		self.tick += 1
-		for agent in self.agents:
-			if agent.is_alive():
-				agent.on_tick(self.agents, self.food)
-		for agent in self.agents:
-			if agent.is_alive():
-				agent.process_attacks(self)
+		# Agents update one after another, so the interaction phase needs to
+		# know where each Agent was and how likely it was to attack before
+		# its turn
+		took_turn = [agent.is_alive() for agent in self.agents]
+		start_pos = [agent.get_pos() for agent in self.agents]
+		start_odds = [agent.get_attack_odds() for agent in self.agents]
+		living = [agent for agent in self.agents if agent.is_alive()]
+		self._update_sensors(living, start_pos)
+		for agent in living:
+			agent.on_tick(self.agents, self.food, not self._SYNC_SIGHT, False)
+		self._update_interactions(took_turn, start_pos, start_odds)
+		attacks, interactions = self._resolve_interactions()
+		if self.telemetry is not None:
+			self.telemetry.record(self.agents, attacks, interactions)
 		for food in self.food:
 			if food.is_alive():
 				food.on_tick()
+		if self._event_batch is not None:
+			self._collect_tick_events(took_turn)
 		self._update_world()
+		if self._event_batch is not None:
+			self._dispatch_events()
 
 	def on_exit(self):
 		""" Called when main application is closing """
-		# Get rid of extra data on front and back in model logs
-		self._log_lifetime = self._log_lifetime[1:-1]
-		self._log_cc = self._log_cc[1:-1]
-		self._log_cd = self._log_cd[1:-1]
-		self._log_dd = self._log_dd[1:-1]
-		self._log_event = self._log_event[1:-1]
+		results = self.get_results()
 		# Output results
 		print "---> Model parameters"
 		print "World size:         (%d,%d)" % self.size
-		print "Agents:             %d" % Model._AGENT_COUNT
-		print "Survivor percent:   %.2f" % Model._SURVIVOR_PERCENT
-		print "Food per Agent:     %.2f" % Model._FOOD_PER_AGENT
+		print "Agents:             %d" % self._AGENT_COUNT
+		print "Survivor percent:   %.2f" % self._SURVIVOR_PERCENT
+		print "Food per Agent:     %.2f" % self._FOOD_PER_AGENT
+		for name in sorted(self.params):
+			print "%-19s %s" % (name + ":", self.params[name])
+		if self._SCREEN_TICKS > 0 and len(self.screen_log) > 0:
+			count = len(self.screen_log)
+			avoided = sum([stats["avoided_ticks"] for stats in self.screen_log])
+			spent = sum([stats["sandbox_ticks"] for stats in self.screen_log])
+			print "Screening:          %d rejected, %+d Agent-ticks net saving " \
+				  "per generation (~%d avoided, %d spent in sandbox)" % (
+				  sum([stats["rejected"] for stats in self.screen_log]),
+				  (avoided - spent) // count, avoided // count, spent // count)
+		if self._BRAIN_CACHE_SIZE > 0:
+			stats = self.brain_cache_stats
+			print ("Brain cache hits:   %d/%d (%.2f), %d of %d caches "
+				   "detached" % (stats.hits, stats.hits + stats.misses,
+								 stats.get_hit_rate(), stats.detached,
+								 stats.caches))
 		print "---> Model results"
 		print "Final generation:   %d" % (self.generation - 1)
 		print "Lifetimes:          [%s]" % ','.join([str(x) for x in
-													 self._log_lifetime])
+													 results["lifetime"]])
 		print "All events:         [%s]" % ','.join([str(x) for x in
-													 self._log_event])
+													 results["event"]])
 		print "C-C events:         [%s]" % ','.join([str(x) for x in
-													 self._log_cc])
+													 results["cc"]])
 		print "C-D events:         [%s]" % ','.join([str(x) for x in
-													 self._log_cd])
+													 results["cd"]])
 		print "D-D events:         [%s]" % ','.join([str(x) for x in
-													 self._log_dd])
+													 results["dd"]])
+		if self._GENERATION_TICKS > 0:
+			print "Censored:           [%s]" % ','.join([str(x) for x in
+														 results["censored"]])
 
 		print "--->  Configuration of random living Agent"
 		if len(self.agents) > 0:
-			print random.choice(self.agents).brain.pretty_print()
+			print self.random.choice(self.agents).brain.pretty_print()
 		else:
 			print "No current Agents"
 
+	def activate(self):
+		"""
+		Point the world size and random number source shared by all Actors at
+		this Model. Called every tick so that several Models can take turns in
+		one process
+		"""
+		actors.Actor.set_world_size(self.size)
+		util.set_random(self.random)
+
+	def run(self, max_generation):
+		""" Run the simulation without a display until max_generation ends """
+		while self.generation <= max_generation:
+			self.on_tick()
+
+	def fork(self, count, max_generation, overrides=None, seeds=None):
+		"""
+		Continue this Model as count branches, each run in a forked child
+		process until max_generation ends, and return a list with the
+		get_results() dict of every branch. The shared history is computed once
+		and copied on write. Overrides is one dict of parameters applied to
+		every branch or a list with one dict per branch; seeds is None or a
+		list with one seed per branch (None keeps the current random stream).
+		Branches run without this Model's genome bank, watchers, or observers.
+		Must be called at a generation boundary; this Model is left as it was
+		"""
+		if self.tick != 0:
+			raise ValueError("Models can only fork at a generation boundary")
+		if overrides is None or isinstance(overrides, dict):
+			overrides = [overrides] * count
+		if seeds is None:
+			seeds = [None] * count
+		if len(overrides) != count or len(seeds) != count:
+			raise ValueError("Expected %d overrides and seeds" % count)
+		# Reject bad overrides here, where the error can reach the caller
+		for params in overrides:
+			self._check_params(params or {})
+		# Don't let children repeat output buffered before the fork
+		sys.stdout.flush()
+		children = []
+		for params, seed in zip(overrides, seeds):
+			read_fd, write_fd = os.pipe()
+			pid = os.fork()
+			if pid == 0:
+				os.close(read_fd)
+				status = 1
+				try:
+					self._run_branch(params, seed, max_generation, write_fd)
+					status = 0
+				except:
+					traceback.print_exc()
+					sys.stderr.flush()
+				finally:
+					os._exit(status)
+			os.close(write_fd)
+			children.append((pid, read_fd))
+		results = []
+		failed = 0
+		for pid, read_fd in children:
+			with os.fdopen(read_fd, "rb") as pipe:
+				data = pipe.read()
+			status = os.waitpid(pid, 0)[1]
+			if status != 0 or len(data) == 0:
+				failed += 1
+				results.append(None)
+			else:
+				results.append(cPickle.loads(data))
+		if failed > 0:
+			raise RuntimeError("%d of %d branches failed" % (failed, count))
+		return results
+
+	def set_params(self, params):
+		"""
+		Override Model, Agent, or Food constants for this Model only. Keys are
+		upper-case constant names, e.g. {"_SURVIVOR_PERCENT": 0.5}, and must be
+		qualified with the class name when several classes define the name,
+		e.g. {"Food._RADIUS": 8}
+		"""
+		resolved = self._check_params(params)
+		for key, value in params.items():
+			owner, name = resolved[key]
+			if owner is Model:
+				setattr(self, name, value)
+			elif owner is actors.Agent:
+				self._agent_params[name] = value
+			else:
+				self._food_params[name] = value
+			self.params[key] = value
+
+	def _check_params(self, params):
+		"""
+		Raise ValueError unless params are valid set_params() overrides for
+		this Model, both key by key and together with its current parameters.
+		Return a dict with the _find_param() result of every key
+		"""
+		resolved = dict([(key, self._find_param(key)) for key in params])
+		screen_ticks = self._SCREEN_TICKS
+		agent_params = dict(self._agent_params)
+		for key, (owner, name) in resolved.items():
+			if owner is Model and name == "_SCREEN_TICKS":
+				screen_ticks = params[key]
+			elif owner is actors.Agent:
+				agent_params[name] = params[key]
+		starve_ticks = self._get_starve_ticks(agent_params)
+		if screen_ticks > 0 and starve_ticks is not None and \
+				screen_ticks >= starve_ticks:
+			raise ValueError("_SCREEN_TICKS must be below %d, the ticks an "
+							 "Agent that never eats takes to starve" %
+							 starve_ticks)
+		return resolved
+
+	def _find_param(self, key):
+		"""
+		Return the class whose constant a set_params() key names and the bare
+		constant name, or raise ValueError if there is no such constant or an
+		unqualified name is ambiguous. Constants are upper-case and defined on
+		the class itself, so methods and inherited Actor state can't be
+		overridden
+		"""
+		owner, _, name = key.rpartition(".")
+		if not name.isupper():
+			raise ValueError("Not a model constant: %s" % key)
+		matches = [cls for cls in (Model, actors.Agent, actors.Food)
+				   if owner in ("", cls.__name__) and name in cls.__dict__]
+		if len(matches) == 0:
+			raise ValueError("Unknown model parameter: %s" % key)
+		if len(matches) > 1:
+			raise ValueError("Ambiguous model parameter %s; qualify it as %s" %
+							 (key, " or ".join(["%s.%s" % (cls.__name__, name)
+											   for cls in matches])))
+		return matches[0], name
+
+	def watch_memory(self, window=5):
+		"""
+		Start sampling memory use at the end of every generation and return
+		the memwatch.MemoryMonitor holding the samples. Measures that grow for
+		window generations in a row are flagged
+		"""
+		self.memory_monitor = memwatch.MemoryMonitor(window)
+		return self.memory_monitor
+
+	def watch_telemetry(self, capacity=256, levels=4, factor=8):
+		"""
+		Start sampling per-tick statistics of the living Agents and return the
+		telemetry.Telemetry holding them. Each statistic keeps its latest
+		capacity ticks, then levels - 1 coarser histories each averaging factor
+		times as many ticks per entry
+		"""
+		self.telemetry = telemetry.Telemetry(capacity, levels, factor)
+		return self.telemetry
+
+	def watch_genomes(self, path=None, bins=16, low=-1.0, high=1.0):
+		"""
+		Start computing genome statistics of the survivors of every generation
+		and return the genome_stats.GenomeLog holding them. Statistics are
+		appended to path as JSON lines if it is given
+		"""
+		self.genome_log = genome_stats.GenomeLog(path, bins, low, high)
+		return self.genome_log
+
+	def subscribe(self, observer, event_types=None, batched=False):
+		"""
+		Call observer with every event (see events.py) of the given types, or
+		of every type if None. The events of a tick are delivered once it
+		ends, in the order they were produced: one call per event, or a single
+		call with a list of the tick's events if batched
+		"""
+		if event_types is not None:
+			event_types = tuple(event_types)
+		self._observers.append((observer, event_types, batched))
+		if self._event_batch is None:
+			self._event_batch = []
+
+	def unsubscribe(self, observer):
+		""" Stop delivering events to observer """
+		self._observers = [entry for entry in self._observers
+						   if entry[0] is not observer]
+		if len(self._observers) == 0:
+			self._event_batch = None
+
+	def get_results(self):
+		"""
+		Return a dict of per-generation logs covering every completed
+		generation: lifetime, event, cc, cd, dd, and censored (1 if the
+		generation was cut short by _GENERATION_TICKS, else 0)
+		"""
+		# Get rid of extra data on front and back in model logs
+		return {"lifetime": self._log_lifetime[1:-1],
+				"event": self._log_event[1:-1],
+				"cc": self._log_cc[1:-1],
+				"cd": self._log_cd[1:-1],
+				"dd": self._log_dd[1:-1],
+				"censored": self._log_censored[1:-1]}
+
 	def get_gen_tick(self):
 		""" Return a tuple with current (generation, tick) """
 		return (self.generation, self.tick)
 
-	def log_event(self, kind):
-		""" Log an event of some sort to be saved in Model results """
+	def log_event(self, kind, count=1):
+		""" Log count events of some sort to be saved in Model results """
 		if kind == "cc":
-			self._log_cc[self.generation] += 1
+			self._log_cc[self.generation] += count
 		elif kind == "cd":
-			self._log_cd[self.generation] += 1
+			self._log_cd[self.generation] += count
 		elif kind == "dd":
-			self._log_dd[self.generation] += 1
+			self._log_dd[self.generation] += count
+
+	def _run_branch(self, params, seed, max_generation, write_fd):
+		""" Body of a child process started by fork() """
+		# Branches only report get_results(): they must not append to the
+		# parent's genome bank or genome log, and their watchers and observers
+		# would only see events the parent never hears about
+		self.genome_bank = None
+		self.genome_log = None
+		self.memory_monitor = None
+		self.telemetry = None
+		self._observers = []
+		self._event_batch = None
+		if params:
+			self.set_params(params)
+			for agent in self.agents:
+				for name, value in self._agent_params.items():
+					setattr(agent, name, value)
+				# Derived from a constant when the Agent was created
+				agent.radius = agent._RADIUS
+			for food in self.food:
+				for name, value in self._food_params.items():
+					setattr(food, name, value)
+				food.radius = food._RADIUS
+		if seed is not None:
+			self.random.seed(seed)
+		self.run(max_generation)
+		with os.fdopen(write_fd, "wb") as pipe:
+			cPickle.dump(self.get_results(), pipe, 2)
+
+	def _update_sensors(self, living, start_pos):
+		"""
+		Set the smell sensors of every living Agent in one pass, and their
+		sight sensors too if _SYNC_SIGHT. Food doesn't move while Agents take
+		their turns, so batched smell is exactly what each Agent would smell
+		on its own turn
+		"""
+		if len(living) == 0:
+			return
+		sensors = actors.Agent.get_sensors_at
+		rdn = living[0]._SMELL_ANGLE
+		lngth = living[0]._SMELL_LENGTH
+		rch = living[0]._SMELL_REACH
+		grid = spatial.Grid(rch, [food.get_pos() for food in self.food])
+		left = sensors(living, self.food, grid, -rdn, lngth, rch)
+		right = sensors(living, self.food, grid, rdn, lngth, rch)
+		for agent, (scent_lft, _), (scent_rght, _) in zip(living, left, right):
+			agent.set_food_sensors(scent_lft, scent_rght)
+		if not self._SYNC_SIGHT:
+			return
+		rdn = living[0]._SIGHT_ANGLE
+		lngth = living[0]._SIGHT_LENGTH
+		rch = living[0]._SIGHT_REACH
+		grid = spatial.Grid(rch, start_pos)
+		left = sensors(living, self.agents, grid, -rdn, lngth, rch)
+		right = sensors(living, self.agents, grid, rdn, lngth, rch)
+		for agent, sight_lft, sight_rght in zip(living, left, right):
+			agent.set_agent_sensors(sight_lft, sight_rght)
+
+	def _update_interactions(self, took_turn, start_pos, start_odds):
+		"""
+		Pair up Agents within attack distance of each other and decide who
+		attacks. Agents are paired in list order with the first free Agent in
+		reach, as if each Agent looked for a partner right after moving: Agents
+		earlier in the list are seen where they are now, later ones where they
+		were at the start of the tick
+		"""
+		agents = self.agents
+		if len(agents) == 0:
+			return
+		reach = agents[0].radius * 2
+		moved_grid = spatial.Grid(reach, [agent.get_pos() for agent in agents])
+		start_grid = spatial.Grid(reach, start_pos)
+		pairs = []
+		for i, agent in enumerate(agents):
+			# If we've interacted with an Agent this tick then don't do so again
+			if not took_turn[i] or agent.interact_agent is not None:
+				continue
+			x, y = pos = agent.get_pos()
+			reach_sqr = (agent.radius * 2) ** 2
+			nearby = ([j for j in moved_grid.query(x, y, reach) if j < i] +
+					  [j for j in start_grid.query(x, y, reach) if j > i])
+			for j in nearby:
+				other = agents[j]
+				if other.interact_agent is not None:
+					continue
+				other_pos = other.get_pos() if j < i else start_pos[j]
+				if util.dist_sqr(pos, other_pos) > reach_sqr:
+					continue
+				agent.interact_agent = other
+				other.interact_agent = agent
+				if other is not agent.prev_interact_agent:
+					pairs.append((i, j))
+				break
+			if agent.interact_agent is None:
+				agent.interact_attacked = False
+		# Draw every attack decision in pairing order
+		odds = []
+		for i, j in pairs:
+			odds.append(agents[i].get_attack_odds())
+			odds.append(agents[j].get_attack_odds() if j < i else
+						start_odds[j])
+		draws = [util.rand(0, 1) <= prob for prob in odds]
+		for k, (i, j) in enumerate(pairs):
+			agents[i].interact_attacked = draws[2 * k]
+			agents[j].interact_attacked = draws[2 * k + 1]
+
+	def _resolve_interactions(self):
+		"""
+		Apply the Prisoner's Dilemma outcome of this tick's interactions to
+		every living Agent, then clear interactions for the upcoming tick.
+		Don't carry out the effect of an interaction if an Agent is still
+		interacting with the Agent it interacted with during the previous tick.
+		Return a tuple (attacks, interactions) counting the Agents that took
+		part in a new interaction and how many of them attacked
+		"""
+		counts = {"cc": 0, "cd": 0, "dd": 0}
+		attacks = 0
+		batch = self._event_batch
+		for agent in self.agents:
+			if not agent.is_alive():
+				continue
+			other = agent.interact_agent
+			if other is not None and other is not agent.prev_interact_agent:
+				outcome = (agent.interact_attacked, other.interact_attacked)
+				agent.health += (agent._PD_REWARD[outcome] *
+								 agent._PD_HEALTH_MULTIPLIER)
+				agent.payoff += agent._PD_REWARD[outcome]
+				if batch is not None:
+					batch.append(events.InteractionResolved(self.generation,
+						self.tick, agent, other, agent.interact_attacked,
+						other.interact_attacked, agent._PD_REWARD[outcome]))
+				agent.remember_interaction(other, other.interact_attacked)
+				agent.prev_interact_agent = other
+				counts[Model._PD_EVENT[outcome]] += 1
+				if agent.interact_attacked:
+					attacks += 1
+			agent.interact_agent = None
+		for kind, count in counts.items():
+			if count > 0:
+				self.log_event(kind, count)
+		return (attacks, sum(counts.values()))
 
 	def _create_initial_gen(self):
 		""" Create an initial population of Agents """
 		next_gen = []
-		for i in range(Model._AGENT_COUNT):
-			brain = actors.Agent.create_random_brain()
-			child = actors.Agent(self.generation, brain)
+		resample = []
+		for i in range(self._AGENT_COUNT):
+			brain = self._create_initial_brain()
+			child = self._create_agent(brain)
 			next_gen.append(child)
+			resample.append((i, self._create_initial_brain))
 		self.agents[:] = next_gen
+		self._screen_agents(resample)
 
 	def _create_next_gen(self):
 		""" Take remaining Agents and create the next Agent generation """
 		next_gen = []
+		resample = []
+		parents = self.agents[:]
 		# Ensure that every remaining Agent is in the next generation and that
 		# each spawns a descendent (which will have random genetic mutations)
-		for parent in self.agents:
-			brain = parent.brain.make_copy()
-			actors.Agent.mutate_brain(brain)
-			child = actors.Agent(self.generation, brain)
+		for parent in parents:
+			brain = self._create_mutant_brain(parent.brain)
+			child = self._create_agent(brain)
+			resample.append((len(next_gen),
+							 lambda b=parent.brain: self._create_mutant_brain(b)))
 			next_gen.append(child)
 			parent.reset()
 			next_gen.append(parent)
 		# Fill in any remaining spots with Agents bred from random parents
-		while len(next_gen) < Model._AGENT_COUNT:
-			parent_1_brain = random.choice(self.agents).brain
-			parent_2_brain = random.choice(self.agents).brain
-			brain = actors.Agent.breed_brain(parent_1_brain, parent_2_brain)
-			actors.Agent.mutate_brain(brain)
-			child = actors.Agent(self.generation, brain)
+		while len(next_gen) < self._AGENT_COUNT:
+			brain = self._create_bred_brain(parents)
+			child = self._create_agent(brain)
+			resample.append((len(next_gen),
+							 lambda: self._create_bred_brain(parents)))
 			next_gen.append(child)
 		self.agents[:] = next_gen
+		self._screen_agents(resample)
+
+	def _create_initial_brain(self):
+		""" Create a random brain, or one from the genome bank if it has any """
+		brain = actors.Agent.create_random_brain()
+		bank = self.genome_bank
+		if bank is not None and len(bank) > 0:
+			if brain.get_topology() != bank.topology:
+				raise ValueError("Genome bank doesn't match Agent brains")
+			brain.set_weights(bank.sample(self.random))
+		return brain
+
+	def _create_mutant_brain(self, parent_brain):
+		""" Create a mutated copy of a parent brain """
+		brain = parent_brain.make_copy()
+		self._mutate_brain(brain)
+		return brain
+
+	def _create_bred_brain(self, parents):
+		""" Create a mutated brain bred from two random parent Agents """
+		parent_1_brain = self.random.choice(parents).brain
+		parent_2_brain = self.random.choice(parents).brain
+		brain = actors.Agent.breed_brain(parent_1_brain, parent_2_brain)
+		self._mutate_brain(brain)
+		return brain
+
+	def _screen_agents(self, resample):
+		"""
+		If pre-screening is on, try out the brains of new Agents in the
+		foraging sandbox and replace those that eat nothing within
+		_SCREEN_TICKS with resampled ones, up to _SCREEN_RETRIES times.
+		Resample is a list of (index into self.agents, function creating a
+		replacement brain)
+		"""
+		if self._SCREEN_TICKS <= 0:
+			return
+		stats = {"generation": self.generation + 1, "screened": 0,
+				 "rejected": 0, "sandbox_ticks": 0, "avoided_ticks": 0}
+		pending = resample
+		for attempt in range(self._SCREEN_RETRIES + 1):
+			brains = [self.agents[i].brain for i, create in pending]
+			trials = self._run_sandbox(brains)
+			stats["screened"] += len(brains)
+			stats["sandbox_ticks"] += sum([trial[0] for trial in trials])
+			pending = [(entry, trial) for entry, trial in zip(pending, trials)
+					   if not trial[1]]
+			if attempt == self._SCREEN_RETRIES or len(pending) == 0:
+				break
+			# Estimate how long each rejected brain would have starved in the
+			# full world from how fast it lost health in the sandbox
+			stats["rejected"] += len(pending)
+			for entry, (ticks, ate, health) in pending:
+				# Without hunger a rejected brain would never have starved
+				if health < 100:
+					stats["avoided_ticks"] += int(ticks * 100.0 /
+												  (100 - health))
+			pending = [entry for entry, trial in pending]
+			for i, create in pending:
+				self.agents[i] = self._create_agent(create())
+		self.screen_log.append(stats)
+
+	def _run_sandbox(self, brains):
+		"""
+		Let copies of each brain forage alone, with the usual amount of Food
+		and no other Agents, until they first eat or _SCREEN_TICKS ticks pass.
+		Every brain starts with the same Food layout. Alone, an Agent sees
+		nothing and the Food only changes when eaten, so sight is skipped and
+		smell uses one spatial.Grid. Return a list with a tuple (ticks, whether
+		it ate, health at the end) per brain
+		"""
+		food = [actors.Food(self._food_params) for i in
+				range(int(self._AGENT_COUNT * self._FOOD_PER_AGENT))]
+		sensors = actors.Agent.get_sensors_at
+		nothing = (0, None)
+		trials = []
+		for brain in brains:
+			agent = actors.Agent(self.generation, brain.make_copy(),
+								 self._agent_params)
+			rdn = agent._SMELL_ANGLE
+			lngth = agent._SMELL_LENGTH
+			rch = agent._SMELL_REACH
+			grid = spatial.Grid(rch, [f.get_pos() for f in food])
+			ticks = 0
+			ate = False
+			while ticks < self._SCREEN_TICKS and not ate:
+				health = agent.health
+				(scent_lft, _), = sensors([agent], food, grid, -rdn, lngth, rch)
+				(scent_rght, _), = sensors([agent], food, grid, rdn, lngth, rch)
+				agent.set_food_sensors(scent_lft, scent_rght)
+				agent.set_agent_sensors(nothing, nothing)
+				agent.on_tick([agent], food, False, False)
+				ticks += 1
+				ate = agent.health > health
+			# Put back the Food that was eaten for the next brain
+			for i, meal in enumerate(food):
+				if not meal.is_alive():
+					x, y = meal.get_pos()
+					food[i] = actors.Food(self._food_params)
+					food[i].move_to(x, y, 0)
+			trials.append((ticks, ate, agent.health))
+		return trials
+
+	def _get_starve_ticks(self, params=None):
+		"""
+		Fewest ticks an Agent that never eats can live given Agent parameter
+		overrides (this Model's by default), or None if hunger never kills it
+		"""
+		agent = actors.Agent
+		if params is None:
+			params = self._agent_params
+		hunger = (params.get("_HUNGER_PER_TICK", agent._HUNGER_PER_TICK) +
+				  params.get("_FORWARD_MAX", agent._FORWARD_MAX) *
+				  params.get("_HUNGER_MOVEMENT_RATIO",
+							 agent._HUNGER_MOVEMENT_RATIO))
+		if hunger <= 0:
+			return None
+		return int(100 / hunger)
 
 	def _create_initial_food(self):
 		""" Create an initial population of Food objects """
 		next_gen = []
-		for i in range(int(Model._AGENT_COUNT * Model._FOOD_PER_AGENT)):
-			food = actors.Food()
+		for i in range(int(self._AGENT_COUNT * self._FOOD_PER_AGENT)):
+			food = actors.Food(self._food_params)
 			next_gen.append(food)
 		self.food[:] = next_gen
 
+	def _export_genomes(self):
+		""" Append the brains of all remaining Agents to the genome bank """
+		self.genome_bank.append_many([(agent.brain.get_weights(),
+									   self._bank_run, self.generation,
+									   agent.age) for agent in self.agents])
+
+	def _create_agent(self, brain):
+		""" Create an Agent of the current generation using Model parameters """
+		if self._BRAIN_CACHE_SIZE > 0:
+			brain.enable_cache(self._BRAIN_CACHE_SIZE,
+							   self._BRAIN_CACHE_QUANTUM,
+							   self.brain_cache_stats)
+		return actors.Agent(self.generation, brain, self._agent_params)
+
+	def _mutate_brain(self, brain):
+		""" Mutate a brain using the Model's mutation parameters """
+		params = self._agent_params
+		actors.Agent.mutate_brain(brain,
+								  params.get("_MUTATE_SYNAPSE_ODDS"),
+								  params.get("_MUTATE_SYNAPSE_SHIFT"))
+
 	def _start_next_generation(self):
 		"""
 		Start the next generation of Agents and Food either from nothing or from
@@ -135,6 +705,12 @@ class Model:
 			self._log_event[self.generation] = (self._log_cc[self.generation] +
 												self._log_cd[self.generation] +
 												self._log_dd[self.generation])
+			if self.memory_monitor is not None:
+				self.memory_monitor.sample(self)
+			if self.genome_log is not None:
+				self.genome_log.record(self.generation, self.agents)
+			if self.genome_bank is not None:
+				self._export_genomes()
 			self._create_next_gen()
 		self._create_initial_food()
 		self.generation += 1
@@ -144,6 +720,13 @@ class Model:
 		self._log_cd.append(0)
 		self._log_dd.append(0)
 		self._log_event.append(0)
+		self._log_censored.append(0)
+		if self._event_batch is not None:
+			# Agents that haven't lived a tick were created for this generation
+			self._event_batch.extend([events.AgentBorn(self.generation, 0, agent)
+									  for agent in self.agents if agent.age == 0])
+			self._event_batch.append(events.GenerationStarted(self.generation,
+															  0, self.agents[:]))
 
 	def _update_world(self):
 		"""
@@ -159,7 +742,75 @@ class Model:
 		for food in self.food[:]:
 			if not food.is_alive():
 				self.food.remove(food)
-				self.food.append(actors.Food())
+				self.food.append(actors.Food(self._food_params))
 		# Do we need to start the next generation?
-		if len(self.agents) <= Model._AGENT_COUNT * Model._SURVIVOR_PERCENT:
+		if len(self.agents) <= self._AGENT_COUNT * self._SURVIVOR_PERCENT:
 			self._start_next_generation()
+		elif 0 < self._GENERATION_TICKS <= self.tick:
+			self._cull_agents()
+			self._log_censored[self.generation] = 1
+			self._start_next_generation()
+
+	def _cull_agents(self):
+		"""
+		Keep only the fittest living Agents, as many as survive a generation
+		that ends on its own. Agents are ranked by health, by age, and by
+		interaction payoff (equal values share a rank); fitness is the sum of
+		the three ranks and ties keep list order
+		"""
+		living = [agent for agent in self.agents if agent.is_alive()]
+		fitness = [0] * len(living)
+		for values in ([agent.health for agent in living],
+					   [agent.age for agent in living],
+					   [agent.payoff for agent in living]):
+			ordered = sorted(values)
+			for i, value in enumerate(values):
+				fitness[i] += bisect.bisect_left(ordered, value)
+		keep = int(self._AGENT_COUNT * self._SURVIVOR_PERCENT)
+		ranked = sorted(range(len(living)), key=lambda i: -fitness[i])
+		survivors = set(ranked[:keep])
+		if self._event_batch is not None:
+			self._event_batch.extend([events.AgentDied(self.generation,
+				self.tick, agent, True) for i, agent in enumerate(living)
+				if i not in survivors])
+		self.agents[:] = [living[i] for i in sorted(survivors)]
+
+	def _collect_tick_events(self, took_turn):
+		"""
+		Add the deaths and meals of this tick and its completion to the event
+		batch. Food is only removed at the end of a tick, so all dead Food was
+		eaten this tick
+		"""
+		batch = self._event_batch
+		generation, tick = self.generation, self.tick
+		for food in self.food:
+			if not food.is_alive():
+				batch.append(events.FoodEaten(generation, tick, food.eaten_by,
+											  food))
+		alive = 0
+		for agent, was_alive in zip(self.agents, took_turn):
+			if agent.is_alive():
+				alive += 1
+			elif was_alive:
+				batch.append(events.AgentDied(generation, tick, agent, False))
+		batch.append(events.TickCompleted(generation, tick, alive))
+
+	def _dispatch_events(self):
+		""" Deliver the events of this tick to every observer """
+		batch = self._event_batch
+		if len(batch) == 0:
+			return
+		self._event_batch = []
+		for observer, event_types, batched in self._observers[:]:
+			if event_types is None:
+				selected = batch
+			else:
+				selected = [event for event in batch
+							if isinstance(event, event_types)]
+			if len(selected) == 0:
+				continue
+			if batched:
+				observer(selected)
+			else:
+				for event in selected:
+					observer(event)
@@ -6,6 +6,8 @@ class NeuralNetwork:
 	def __init__(self):
 		self.neurons = []
 		self.synapses = []
+		# Optional memo of update() results; see enable_cache()
+		self.cache = None
 
 	def make_copy(self):
 		""" Create and return a deep-copy of this NeuralNetwork """
@@ -31,8 +33,26 @@ class NeuralNetwork:
 				return neuron
 		return None
 
+	def enable_cache(self, size, quantum=0.0, stats=None):
+		"""
+		Remember the outcome of update() for between size and twice size
+		recently used states; see BrainCache. A state is the energy of every
+		Neuron feeding a Synapse, rounded to a multiple of quantum (exact if
+		0); a larger quantum gives more hits but only approximate outputs.
+		Lookups and detached caches are counted in stats, which may be shared
+		between networks
+		"""
+		self.cache = BrainCache(self, size, quantum, stats)
+
 	def update(self):
 		""" Update all components """
+		if self.cache is not None:
+			self.cache.update()
+			return
+		self.update_uncached()
+
+	def update_uncached(self):
+		""" Update all components without consulting the cache """
 		for synapse in self.synapses:
 			synapse.update_energy()
 		for neuron in self.neurons:
@@ -88,6 +108,26 @@ class NeuralNetwork:
 		self.neurons[:] = temp_nnet.neurons
 		self.synapses[:] = temp_nnet.synapses
 
+	def get_topology(self):
+		"""
+		Generate and return a string describing every component except Synapse
+		weights; networks with equal topologies can exchange weights. Format:
+		[n0.name:n0.is_input,...][s0.src:s0.dest,...]
+		"""
+		neuron_str = ["%s:%d"%(n.name, n.is_input) for n in self.neurons]
+		synapse_str = ["%s:%s"%(s.src.name, s.dest.name) for s in self.synapses]
+		return "[" + ",".join(neuron_str) + "][" + ",".join(synapse_str) + "]"
+
+	def get_weights(self):
+		""" Return a list with the weight of every Synapse in order """
+		return [s.weight for s in self.synapses]
+
+	def set_weights(self, weights):
+		""" Replace the weight of every Synapse, in order, with weights """
+		assert len(weights) == len(self.synapses)
+		for synapse, weight in zip(self.synapses, weights):
+			synapse.weight = weight
+
 	def pretty_print(self):
 		"""
 		Generate and return a human-readable representation of all components.
@@ -98,6 +138,97 @@ class NeuralNetwork:
 		output = ", ".join(synapse_str)
 		return output
 
+class CacheStats:
+	"""
+	Hit and miss counts for one or more BrainCache objects, plus how many
+	caches were created and how many detached themselves. Lookups stop being
+	counted once a cache detaches
+	"""
+	def __init__(self):
+		self.hits = 0
+		self.misses = 0
+		self.caches = 0
+		self.detached = 0
+
+	def get_hit_rate(self):
+		""" Fraction of lookups that were hits, or 0 if there were none """
+		total = self.hits + self.misses
+		if total == 0:
+			return 0.0
+		return self.hits / float(total)
+
+
+class BrainCache:
+	"""
+	Bounded memo of NeuralNetwork.update() results. This is not an LRU
+	cache: entries live in two plain dicts, and once the current one holds
+	size entries it replaces the previous one and a fresh dict starts. A hit
+	in the previous dict copies the entry into the current one, so an entry
+	survives as long as it is used at least once per size insertions;
+	everything else is dropped a whole dict at a time. A cache that hits
+	less than _MIN_HIT_RATE of its first _PROBE_LOOKUPS lookups detaches
+	itself from the network, counted in CacheStats.detached, so a
+	poorly-matched cache stops costing time
+	"""
+	_PROBE_LOOKUPS = 64
+	_MIN_HIT_RATE = 0.25
+	# Added before truncating quantized energies so that int() rounds half up
+	# for any energy within _KEY_OFFSET quanta of zero
+	_KEY_OFFSET = 2 ** 20 + 0.5
+
+	def __init__(self, nnet, size, quantum, stats=None):
+		self.nnet = nnet
+		self.size = size
+		self.quantum = quantum
+		self.scale = 1.0 / quantum if quantum > 0 else 0.0
+		self.stats = stats if stats is not None else CacheStats()
+		self.stats.caches += 1
+		self.entries = {}
+		self.previous = {}
+		self.lookups = self.hits = 0
+		# Neurons whose energy determines the outcome and those it changes
+		self.sources = []
+		for synapse in nnet.synapses:
+			if synapse.src not in self.sources:
+				self.sources.append(synapse.src)
+		self.targets = [n for n in nnet.neurons if not n.is_input]
+
+	def update(self):
+		""" Update the NeuralNetwork, reusing a cached outcome if possible """
+		if self.quantum > 0:
+			scale = self.scale
+			offset = BrainCache._KEY_OFFSET
+			key = tuple([int(n.energy * scale + offset) for n in self.sources])
+		else:
+			key = tuple([n.energy for n in self.sources])
+		outcome = self.entries.get(key)
+		if outcome is None:
+			outcome = self.previous.get(key)
+			if outcome is not None:
+				self._insert(key, outcome)
+		self.lookups += 1
+		if outcome is not None:
+			self.hits += 1
+			self.stats.hits += 1
+			for neuron, energy in zip(self.targets, outcome):
+				neuron.energy = energy
+		else:
+			self.stats.misses += 1
+			self.nnet.update_uncached()
+			self._insert(key, tuple([n.energy for n in self.targets]))
+		if (self.lookups == BrainCache._PROBE_LOOKUPS and
+				self.hits < self.lookups * BrainCache._MIN_HIT_RATE):
+			self.nnet.cache = None
+			self.stats.detached += 1
+
+	def _insert(self, key, outcome):
+		""" Add an entry, starting a new generation of entries when full """
+		if len(self.entries) >= self.size:
+			self.previous = self.entries
+			self.entries = {}
+		self.entries[key] = outcome
+
+
 class Neuron:
 	def __init__(self, name, is_input = False):
 		self.name = name
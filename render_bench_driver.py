@@ -0,0 +1,155 @@
+import json
+import os
+import sys
+import time
+
+# Render off screen unless told otherwise; must be set before pygame loads
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+import gfx_driver
+import model
+import pygame
+
+
+class _UncappedClock:
+	""" Stands in for pygame.time.Clock so that frames aren't rate limited """
+	def tick(self, framerate=0):
+		return 0
+
+
+class RenderBenchApp:
+	# Render stages of GraphicsApp._on_render() timed separately, in order
+	_STAGES = ["_draw_background", "_draw_food", "_draw_agents", "_draw_info",
+			   "_draw_telemetry", "_draw_focus", "flip"]
+	_AGENT_COUNTS = [20, 100, 500, 2000]
+	_SEED = 1
+	# Ticks simulated before rendering so that the scene looks like a running
+	# world. Every frame then draws the same scene so that runs are comparable.
+	# Batched sight keeps warming up thousands of Agents quick
+	_WARMUP_TICKS = 5
+	_WARMUP_PARAMS = {"_SYNC_SIGHT": True}
+
+	def __init__(self, argc, argv):
+		# Command line arguments
+		if argc < 3 or int(argv[1]) <= 0 or not argv[2].endswith((".csv",
+																 ".json")):
+			self._print_usage(argv)
+			exit()
+		self.frames = int(argv[1])
+		self.output_path = argv[2]
+		self.agent_counts = ([int(arg) for arg in argv[3:]] or
+							 RenderBenchApp._AGENT_COUNTS)
+		self.app = None
+		# List of per-agent-count result dicts; see _summarize()
+		self.results = []
+
+	def _print_usage(self, argv):
+		""" Print command line argument info to standard output """
+		print ("usage: python %s frames output.csv|output.json [agents ...]"
+			   % argv[0])
+
+	def on_init(self):
+		""" Open the (by default invisible) display through GraphicsApp """
+		self.app = gfx_driver.GraphicsApp(2, [sys.argv[0], "1"])
+		self.app.on_init()
+		self.app.clock = _UncappedClock()
+
+	def on_execute(self):
+		""" Render frames of a seeded world for every agent count """
+		for count in self.agent_counts:
+			app = self.app
+			params = dict(RenderBenchApp._WARMUP_PARAMS, _AGENT_COUNT=count)
+			app.model = model.Model(app.size, params, RenderBenchApp._SEED)
+			app.model.watch_telemetry(gfx_driver.GraphicsApp._SPARK_WIDTH)
+			for i in range(RenderBenchApp._WARMUP_TICKS):
+				app.model.on_tick()
+			app.focus_agent = None
+			timings = dict([(stage, []) for stage in RenderBenchApp._STAGES])
+			frame_times = []
+			flip = pygame.display.flip
+			try:
+				for stage in RenderBenchApp._STAGES[:-1]:
+					setattr(app, stage, self._timed(getattr(app, stage),
+													timings[stage]))
+				pygame.display.flip = self._timed(flip, timings["flip"])
+				for i in range(self.frames):
+					# Keep the neural network overlay on screen
+					if app.focus_agent is None and len(app.model.agents) > 0:
+						app.focus_agent = app.model.agents[0]
+					start = time.time()
+					app._on_render()
+					frame_times.append(time.time() - start)
+			finally:
+				pygame.display.flip = flip
+				for stage in RenderBenchApp._STAGES[:-1]:
+					delattr(app, stage)
+			self.results.append(self._summarize(count, frame_times, timings))
+
+	def on_exit(self):
+		""" Output a table of the results and save them """
+		pygame.quit()
+		print "---> Render time per frame (ms), %d frames, seed %d" % (
+			self.frames, RenderBenchApp._SEED)
+		print "%8s  %8s" % ("agents", "frame") + "".join(
+			["  %16s" % stage for stage in RenderBenchApp._STAGES])
+		for result in self.results:
+			print "%8d  %8.3f" % (result["agents"], result["frame_ms"]) + "".join(
+				["  %16.3f" % result["stages"][stage]["mean_ms"]
+				 for stage in RenderBenchApp._STAGES])
+		with open(self.output_path, "w") as f:
+			if self.output_path.endswith(".json"):
+				json.dump({"frames": self.frames, "seed": RenderBenchApp._SEED,
+						   "size": self.app.size, "results": self.results},
+						  f, indent=1, sort_keys=True)
+			else:
+				f.write("agents,stage,mean_ms,median_ms,max_ms,share\n")
+				for result in self.results:
+					for stage in RenderBenchApp._STAGES + ["frame"]:
+						if stage == "frame":
+							row = dict(result["frame"], share=1.0)
+						else:
+							row = result["stages"][stage]
+						f.write("%d,%s,%.4f,%.4f,%.4f,%.4f\n" % (
+							result["agents"], stage, row["mean_ms"],
+							row["median_ms"], row["max_ms"], row["share"]))
+		print "Results saved to %s" % self.output_path
+
+	def _timed(self, function, samples):
+		""" Wrap function so that each call appends its duration to samples """
+		def timed(*args, **kwargs):
+			start = time.time()
+			try:
+				return function(*args, **kwargs)
+			finally:
+				samples.append(time.time() - start)
+		return timed
+
+	def _summarize(self, count, frame_times, timings):
+		"""
+		Return a dict with the agent count, the mean frame time, and mean,
+		median, and max milliseconds plus share of the frame for each stage
+		"""
+		frame = self._describe(frame_times)
+		stages = {}
+		for stage, samples in timings.items():
+			stages[stage] = self._describe(samples)
+			stages[stage]["share"] = (stages[stage]["mean_ms"] /
+									  max(frame["mean_ms"], 1e-9))
+		return {"agents": count, "frame_ms": frame["mean_ms"], "frame": frame,
+				"stages": stages}
+
+	def _describe(self, samples):
+		""" Mean, median, and max of durations in seconds, as milliseconds """
+		if len(samples) == 0:
+			return {"mean_ms": 0.0, "median_ms": 0.0, "max_ms": 0.0}
+		ordered = sorted(samples)
+		return {"mean_ms": 1000.0 * sum(ordered) / len(ordered),
+				"median_ms": 1000.0 * ordered[len(ordered) // 2],
+				"max_ms": 1000.0 * ordered[-1]}
+
+
+if __name__ == "__main__" :
+	app_instance = RenderBenchApp(len(sys.argv), sys.argv)
+	app_instance.on_init()
+	app_instance.on_execute()
+	app_instance.on_exit()
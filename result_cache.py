@@ -0,0 +1,146 @@
+import actors
+import cPickle
+import hashlib
+import model
+import os
+import tempfile
+
+# Sources whose contents determine simulation results
+_SOURCES = ["actors.py", "model.py", "nnet.py", "spatial.py", "util.py"]
+# Class attributes that are runtime state rather than configuration
+_STATE = ["_WORLD_SIZE"]
+
+
+def get_source_fingerprint():
+	""" Return a hash of the source files the simulation depends on """
+	digest = hashlib.sha1()
+	directory = os.path.dirname(os.path.abspath(__file__))
+	for name in _SOURCES:
+		with open(os.path.join(directory, name), "rb") as f:
+			digest.update(name + "\0" + f.read())
+	return digest.hexdigest()
+
+
+def get_configuration(size, params):
+	"""
+	Return a dict of every Model, Agent, and Food constant as a Model built
+	with params would use it, plus the world size
+	"""
+	config = {"size": tuple(size)}
+	for owner, cls in (("Model", model.Model), ("Agent", actors.Agent),
+					   ("Food", actors.Food)):
+		for name in dir(cls):
+			if name.startswith("_") and name.isupper() and name not in _STATE:
+				config[owner + "." + name] = getattr(cls, name)
+	# Let Model resolve the overrides; it creates no Actors until its first tick
+	sim = model.Model(size, params)
+	for name, value in sim.__dict__.items():
+		if name.startswith("_") and name.isupper():
+			config["Model." + name] = value
+	for name, value in sim._agent_params.items():
+		config["Agent." + name] = value
+	for name, value in sim._food_params.items():
+		config["Food." + name] = value
+	return config
+
+
+class ResultCache:
+	"""
+	On-disk cache of headless simulation results. Entries are keyed by a hash
+	of the complete Model configuration, the seed, and a fingerprint of the
+	simulation source, but not the generation count: an entry holds the
+	results of its first G generations and a checkpoint of the Model at the
+	start of generation G + 1, so longer runs resume from it. The least
+	recently used entries are evicted once the cache exceeds max_bytes
+	"""
+	def __init__(self, directory, max_bytes=256 * 1024 * 1024):
+		self.directory = directory
+		self.max_bytes = max_bytes
+		self.fingerprint = get_source_fingerprint()
+		self.hits = self.resumes = self.misses = 0
+		if not os.path.isdir(directory):
+			os.makedirs(directory)
+
+	def get_key(self, size, params, seed):
+		""" Return the key of the entry for a run """
+		config = sorted(get_configuration(size, params).items())
+		return hashlib.sha1(repr((config, seed, self.fingerprint))).hexdigest()
+
+	def run(self, size, params, seed, generations):
+		"""
+		Return Model.get_results() of a run of the given number of generations,
+		from the cache if possible. Unseeded runs can't be reproduced, so they
+		bypass the cache
+		"""
+		if seed is None:
+			sim = model.Model(size, params)
+			sim.run(generations)
+			return sim.get_results()
+		key = self.get_key(size, params, seed)
+		entry = self._load(key)
+		if entry is not None and entry["generations"] >= generations:
+			self.hits += 1
+			return dict([(name, log[:generations])
+						 for name, log in entry["results"].items()])
+		if entry is not None:
+			self.resumes += 1
+			sim = cPickle.loads(entry["checkpoint"])
+		else:
+			self.misses += 1
+			sim = model.Model(size, params, seed)
+		sim.run(generations)
+		results = sim.get_results()
+		# Every Agent's memory is empty at a generation boundary, so nothing
+		# keyed by id() goes stale in the checkpoint
+		self._store(key, {"generations": generations, "results": results,
+						  "checkpoint": cPickle.dumps(sim, 2)})
+		return results
+
+	def _path(self, key):
+		return os.path.join(self.directory, key + ".pickle")
+
+	def _load(self, key):
+		""" Return the entry stored under key or None """
+		path = self._path(key)
+		try:
+			with open(path, "rb") as f:
+				entry = cPickle.load(f)
+		except (IOError, EOFError, cPickle.UnpicklingError):
+			return None
+		# Mark as recently used
+		try:
+			os.utime(path, None)
+		except OSError:
+			pass
+		return entry
+
+	def _store(self, key, entry):
+		""" Atomically write an entry, then evict entries if over budget """
+		handle, temp_path = tempfile.mkstemp(dir=self.directory,
+											 suffix=".tmp")
+		with os.fdopen(handle, "wb") as f:
+			cPickle.dump(entry, f, 2)
+		os.rename(temp_path, self._path(key))
+		self._evict()
+
+	def _evict(self):
+		""" Remove least recently used entries until within max_bytes """
+		entries = []
+		for name in os.listdir(self.directory):
+			if not name.endswith(".pickle"):
+				continue
+			path = os.path.join(self.directory, name)
+			try:
+				stat = os.stat(path)
+			except OSError:
+				continue
+			entries.append((stat.st_mtime, stat.st_size, path))
+		total = sum([size for mtime, size, path in entries])
+		for mtime, size, path in sorted(entries):
+			if total <= self.max_bytes:
+				break
+			try:
+				os.remove(path)
+			except OSError:
+				pass
+			total -= size
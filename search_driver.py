@@ -0,0 +1,136 @@
+import model
+import multiprocessing
+import random
+import result_cache
+import sys
+
+
+def run_trial(job):
+	"""
+	Run one headless simulation and return its per-generation results. Job is
+	a tuple (size, params, seed, generations, cache_dir); module-level so that
+	it can be sent to a process pool. Runs go through a ResultCache in
+	cache_dir unless it is None
+	"""
+	size, params, seed, generations, cache_dir = job
+	if cache_dir is not None:
+		cache = result_cache.ResultCache(cache_dir)
+		return cache.run(size, params, seed, generations)
+	sim = model.Model(size, params, seed)
+	sim.run(generations)
+	return sim.get_results()
+
+
+def mean_lifetime(results):
+	""" Average number of ticks per generation """
+	lifetimes = results["lifetime"]
+	if len(lifetimes) == 0:
+		return 0.0
+	return sum(lifetimes) / float(len(lifetimes))
+
+
+def cc_ratio(results):
+	""" Fraction of all interactions that were cooperate-cooperate """
+	events = sum(results["event"])
+	if events == 0:
+		return 0.0
+	return sum(results["cc"]) / float(events)
+
+
+class SearchApp:
+	# Range (low, high) each constant is sampled from for a new configuration
+	_SEARCH_SPACE = {
+		"_SURVIVOR_PERCENT": (0.1, 0.5),
+		"_FOOD_PER_AGENT": (0.5, 2.0),
+		"_MUTATE_SYNAPSE_ODDS": (0.05, 0.5),
+		"_PD_HEALTH_MULTIPLIER": (5, 40),
+		"_HUNGER_PER_TICK": (0.2, 0.6),
+	}
+	# Metrics that configurations can be ranked by (higher is better)
+	_METRICS = {
+		"lifetime": mean_lifetime,
+		"cc": cc_ratio,
+	}
+	# Successive halving: each rung keeps the best 1/_ETA of configurations
+	# and runs them for _ETA times as many generations
+	_ETA = 2
+	_MIN_GENERATIONS = 2
+
+	def __init__(self, argc, argv):
+		# Command line arguments
+		if argc < 3 or argc > 6 or int(argv[1]) <= 0 or int(argv[2]) <= 0:
+			self._print_usage(argv)
+			exit()
+		self.config_count = int(argv[1])
+		self.max_generation = int(argv[2])
+		self.metric = argv[3] if argc > 3 else "lifetime"
+		if self.metric not in SearchApp._METRICS:
+			self._print_usage(argv)
+			exit()
+		self.processes = int(argv[4]) if argc > 4 else None
+		# Survivors of a rung resume from the checkpoints of the previous one
+		self.cache_dir = argv[5] if argc > 5 else None
+		self.size = (1024, 768)
+		self.pool = None
+		# List of (score, params, seed, generations) from the final rung
+		self.ranking = []
+
+	def _print_usage(self, argv):
+		""" Print command line argument info to standard output """
+		print ("usage: python %s configs max_generation [metric] [processes] "
+			   "[cache_dir]" % argv[0])
+		print "metrics: %s" % ", ".join(sorted(SearchApp._METRICS))
+
+	def on_init(self):
+		""" Start the worker processes """
+		self.pool = multiprocessing.Pool(self.processes)
+
+	def on_execute(self):
+		"""
+		Sample configurations then repeatedly run them, keeping only the best
+		fraction and increasing their budget until max_generation is reached
+		"""
+		metric = SearchApp._METRICS[self.metric]
+		configs = [(self._sample_params(), random.randint(0, sys.maxint))
+				   for i in range(self.config_count)]
+		generations = min(SearchApp._MIN_GENERATIONS, self.max_generation)
+
+		while True:
+			print "rung: %d configurations, %d generations" % (len(configs),
+																generations)
+			jobs = [(self.size, params, seed, generations, self.cache_dir)
+					for params, seed in configs]
+			scores = [metric(r) for r in self.pool.map(run_trial, jobs)]
+			ranked = sorted(zip(scores, configs), key=lambda x: -x[0])
+			self.ranking = [(score, params, seed, generations)
+							for score, (params, seed) in ranked]
+			if len(configs) == 1 or generations >= self.max_generation:
+				break
+			keep = max(1, len(configs) // SearchApp._ETA)
+			configs = [config for score, config in ranked[:keep]]
+			generations = min(generations * SearchApp._ETA,
+							  self.max_generation)
+
+	def on_exit(self):
+		""" Stop the worker processes and output the final ranking """
+		self.pool.close()
+		self.pool.join()
+		print "---> Search results (%s)" % self.metric
+		for score, params, seed, generations in self.ranking:
+			print "%.4f  seed=%d  generations=%d" % (score, seed, generations)
+			for name in sorted(params):
+				print "    %-24s %.4f" % (name, params[name])
+
+	def _sample_params(self):
+		""" Return a random configuration drawn from the search space """
+		params = {}
+		for name, (low, high) in SearchApp._SEARCH_SPACE.items():
+			params[name] = random.uniform(low, high)
+		return params
+
+
+if __name__ == "__main__" :
+	app_instance = SearchApp(len(sys.argv), sys.argv)
+	app_instance.on_init()
+	app_instance.on_execute()
+	app_instance.on_exit()
@@ -0,0 +1,36 @@
+class Grid:
+	"""
+	Uniform bucket grid over a list of points used to answer neighbour
+	queries without scanning every point. Points are referred to by their
+	index in the list the Grid was built from
+	"""
+	def __init__(self, cell_size, points):
+		self.cell_size = float(cell_size)
+		self.cells = {}
+		for i, (x, y) in enumerate(points):
+			key = (int(x // self.cell_size), int(y // self.cell_size))
+			bucket = self.cells.get(key)
+			if bucket is None:
+				self.cells[key] = [i]
+			else:
+				bucket.append(i)
+
+	def query(self, x, y, reach):
+		"""
+		Return the sorted indices of all points in cells overlapping the square
+		of half-width reach around (x,y). This is a superset of the points
+		within reach, so callers still need to check exact distances
+		"""
+		size = self.cell_size
+		x0 = int((x - reach) // size)
+		x1 = int((x + reach) // size)
+		y0 = int((y - reach) // size)
+		y1 = int((y + reach) // size)
+		found = []
+		for cx in range(x0, x1 + 1):
+			for cy in range(y0, y1 + 1):
+				bucket = self.cells.get((cx, cy))
+				if bucket is not None:
+					found.extend(bucket)
+		found.sort()
+		return found
@@ -0,0 +1,428 @@
+import SocketServer
+import hashlib
+import json
+import model
+import os
+import socket
+import sys
+import threading
+import time
+
+
+def get_job_id(params, seed, generations):
+	""" Stable id of a job, so that adding the same job twice is harmless """
+	key = json.dumps([params, seed, generations], sort_keys=True)
+	return hashlib.sha1(key).hexdigest()[:16]
+
+
+class JobQueue:
+	"""
+	Persistent queue of sweep jobs (params, seed, generations). Every change is
+	appended to a journal of JSON lines that is replayed when the queue is
+	opened again, so jobs and results survive coordinator restarts. Jobs are
+	leased to one worker at a time; a lease lapses if the worker disconnects
+	or sends neither results nor heartbeats for _LEASE_SECONDS
+	"""
+	_LEASE_SECONDS = 120
+
+	def __init__(self, path):
+		self.path = path
+		self.lock = threading.Lock()
+		# Job dicts by id and in the order they were added
+		self.jobs = {}
+		self.order = []
+		# Per-generation results by id then generation
+		self.results = {}
+		self.finished = set()
+		# Worker name, expiry time, and connection that last granted or renewed
+		# the lease of each leased job by id
+		self.leases = {}
+		if os.path.exists(path):
+			# Length of the journal up to its last complete line
+			valid = 0
+			with open(path, "rb") as f:
+				for line in f:
+					if not line.endswith("\n"):
+						# Partial line written as the coordinator went down
+						break
+					valid += len(line)
+					try:
+						entry = json.loads(line)
+					except ValueError:
+						continue
+					self._apply(entry)
+			# Cut off a partial last line so new entries don't join onto it
+			if valid < os.path.getsize(path):
+				with open(path, "r+b") as f:
+					f.truncate(valid)
+		self.journal = open(path, "a")
+
+	def add(self, params, seed, generations):
+		"""
+		Add a job unless it is already queued; return its id. Jobs need an
+		integer seed so that their results can be reproduced
+		"""
+		if not isinstance(seed, (int, long)) or isinstance(seed, bool):
+			raise ValueError("Sweep jobs need an integer seed, got %r" %
+							 (seed,))
+		id_ = get_job_id(params, seed, generations)
+		with self.lock:
+			if id_ not in self.jobs:
+				self._log({"event": "add", "id": id_, "params": params,
+						   "seed": seed, "generations": generations})
+		return id_
+
+	def acquire(self, worker, connection=None):
+		"""
+		Lease the oldest unfinished job without a live lease to worker over a
+		connection and return it, or None if there is no such job
+		"""
+		now = time.time()
+		with self.lock:
+			for id_ in self.order:
+				if id_ in self.finished:
+					continue
+				lease = self.leases.get(id_)
+				if lease is not None and lease[1] > now:
+					continue
+				self.leases[id_] = (worker, now + JobQueue._LEASE_SECONDS,
+									connection)
+				return self.jobs[id_]
+		return None
+
+	def release(self, connection):
+		"""
+		Drop every lease last granted or renewed over a connection so its jobs
+		are handed out again. Leases a worker renewed after reconnecting are
+		kept
+		"""
+		with self.lock:
+			for id_, lease in self.leases.items():
+				if lease[2] is connection:
+					del self.leases[id_]
+
+	def renew(self, worker, id_, connection=None):
+		"""
+		Extend the lease of worker on a job, now held over a connection.
+		Return False if the job is unknown or already finished, in which case
+		the worker should abandon it
+		"""
+		with self.lock:
+			return self._renew(worker, id_, connection)
+
+	def record(self, worker, id_, generation, results, connection=None):
+		"""
+		Store the results of one generation of a job and renew the lease of
+		worker as in renew(). Duplicates are ignored. Return False if the job
+		is unknown or already finished, in which case the worker should
+		abandon it
+		"""
+		with self.lock:
+			if not self._renew(worker, id_, connection):
+				return False
+			if generation not in self.results[id_]:
+				self._log({"event": "result", "id": id_,
+						   "generation": generation, "results": results})
+		return True
+
+	def finish(self, id_):
+		""" Mark a job as finished once all of its generations are recorded """
+		with self.lock:
+			job = self.jobs.get(id_)
+			if job is None or id_ in self.finished:
+				return
+			if len(self.results[id_]) < job["generations"]:
+				return
+			self._log({"event": "finish", "id": id_})
+			self.leases.pop(id_, None)
+
+	def is_finished(self):
+		""" Have all jobs been finished? """
+		with self.lock:
+			return len(self.finished) == len(self.jobs)
+
+	def get_results(self, id_):
+		""" Return per-generation results of a job in Model.get_results() form """
+		results = {}
+		for generation in sorted(self.results[id_]):
+			for name, value in self.results[id_][generation].items():
+				results.setdefault(name, []).append(value)
+		return results
+
+	def close(self):
+		self.journal.close()
+
+	def _renew(self, worker, id_, connection):
+		""" renew() for callers already holding the lock """
+		if id_ not in self.jobs or id_ in self.finished:
+			return False
+		self.leases[id_] = (worker, time.time() + JobQueue._LEASE_SECONDS,
+							connection)
+		return True
+
+	def _log(self, entry):
+		""" Append an entry to the journal, then apply it """
+		self.journal.write(json.dumps(entry) + "\n")
+		self.journal.flush()
+		os.fsync(self.journal.fileno())
+		self._apply(entry)
+
+	def _apply(self, entry):
+		""" Update in-memory state from a journal entry """
+		id_ = entry["id"]
+		if entry["event"] == "add":
+			if id_ not in self.jobs:
+				self.jobs[id_] = {"id": id_, "params": entry["params"],
+								  "seed": entry["seed"],
+								  "generations": entry["generations"]}
+				self.order.append(id_)
+				self.results[id_] = {}
+		elif entry["event"] == "result":
+			self.results[id_][entry["generation"]] = entry["results"]
+		elif entry["event"] == "finish":
+			self.finished.add(id_)
+
+
+class _CoordinatorHandler(SocketServer.StreamRequestHandler):
+	""" Serves one worker connection; each message is a line of JSON """
+	def handle(self):
+		try:
+			while True:
+				line = self.rfile.readline()
+				if not line:
+					break
+				message = json.loads(line)
+				reply = self.server.coordinator.on_message(message, self)
+				self.wfile.write(json.dumps(reply) + "\n")
+		except socket.error:
+			pass
+		finally:
+			# A worker that already reconnected keeps the leases it renewed
+			self.server.coordinator.queue.release(self)
+
+
+class Coordinator:
+	""" Hands out jobs from a JobQueue to workers over TCP """
+	# Seconds an idle worker should wait before asking for work again
+	_WAIT_SECONDS = 1
+
+	def __init__(self, queue, port, host=""):
+		self.queue = queue
+		self.server = SocketServer.ThreadingTCPServer((host, port),
+													  _CoordinatorHandler,
+													  bind_and_activate=False)
+		self.server.allow_reuse_address = True
+		self.server.daemon_threads = True
+		self.server.coordinator = self
+		self.server.server_bind()
+		self.server.server_activate()
+		self.port = self.server.server_address[1]
+		self.thread = None
+
+	def start(self):
+		""" Serve workers in a background thread """
+		self.thread = threading.Thread(target=self.server.serve_forever)
+		self.thread.daemon = True
+		self.thread.start()
+
+	def stop(self):
+		self.server.shutdown()
+		self.server.server_close()
+
+	def on_message(self, message, connection=None):
+		""" Return the reply to a message from a worker over a connection """
+		kind = message["type"]
+		worker = message["worker"]
+		if kind == "request":
+			job = self.queue.acquire(worker, connection)
+			if job is not None:
+				return {"type": "job", "job": job}
+			if self.queue.is_finished():
+				return {"type": "done"}
+			return {"type": "wait", "seconds": Coordinator._WAIT_SECONDS}
+		elif kind == "result":
+			keep = self.queue.record(worker, message["id"],
+									 message["generation"], message["results"],
+									 connection)
+			return {"type": "ack", "cancel": not keep}
+		elif kind == "heartbeat":
+			keep = self.queue.renew(worker, message["id"], connection)
+			return {"type": "ack", "cancel": not keep}
+		elif kind == "finish":
+			self.queue.finish(message["id"])
+			return {"type": "ack", "cancel": False}
+		return {"type": "error", "reason": "unknown message %s" % kind}
+
+
+class Worker:
+	"""
+	Runs jobs from a Coordinator headlessly and streams back the results of
+	each generation as soon as it completes. Reconnects if the Coordinator
+	goes away and gives up after _RETRY_SECONDS without a connection
+	"""
+	_RETRY_SECONDS = 60
+	# Longest a job runs without contacting the Coordinator, well below
+	# JobQueue._LEASE_SECONDS so that slow generations keep their lease
+	_HEARTBEAT_SECONDS = 30
+
+	def __init__(self, host, port, name=None, size=(1024, 768)):
+		self.address = (host, port)
+		self.name = name or "%s-%d" % (socket.gethostname(), os.getpid())
+		self.size = size
+		self.connection = None
+		self.jobs_run = 0
+
+	def run(self):
+		""" Work until the Coordinator reports that every job is finished """
+		while True:
+			reply = self._send({"type": "request"})
+			if reply is None or reply["type"] == "done":
+				break
+			elif reply["type"] == "wait":
+				time.sleep(reply["seconds"])
+			elif reply["type"] == "job":
+				self._run_job(reply["job"])
+		self._disconnect()
+
+	def _run_job(self, job):
+		""" Simulate a job, reporting each generation as it completes """
+		sim = model.Model(self.size, job["params"], job["seed"])
+		generations = job["generations"]
+		reported = 0
+		contacted = time.time()
+		while reported < generations:
+			sim.on_tick()
+			completed = min(sim.generation - 1, generations)
+			if completed <= reported:
+				if time.time() - contacted >= Worker._HEARTBEAT_SECONDS:
+					reply = self._send({"type": "heartbeat", "id": job["id"]})
+					if reply is None or reply["cancel"]:
+						return
+					contacted = time.time()
+				continue
+			results = sim.get_results()
+			for generation in range(reported + 1, completed + 1):
+				values = dict([(name, log[generation - 1])
+							   for name, log in results.items()])
+				reply = self._send({"type": "result", "id": job["id"],
+									"generation": generation,
+									"results": values})
+				if reply is None or reply["cancel"]:
+					return
+			reported = completed
+			contacted = time.time()
+		self._send({"type": "finish", "id": job["id"]})
+		self.jobs_run += 1
+
+	def _send(self, message):
+		"""
+		Send a message and return the reply, reconnecting as needed. Return
+		None if the Coordinator can't be reached
+		"""
+		message["worker"] = self.name
+		data = json.dumps(message) + "\n"
+		give_up = time.time() + Worker._RETRY_SECONDS
+		while time.time() < give_up:
+			try:
+				if self.connection is None:
+					sock = socket.create_connection(self.address)
+					self.connection = (sock, sock.makefile("rb"))
+				sock, reader = self.connection
+				sock.sendall(data)
+				line = reader.readline()
+				if line:
+					return json.loads(line)
+			except socket.error:
+				pass
+			self._disconnect()
+			time.sleep(1)
+		return None
+
+	def _disconnect(self):
+		""" Close the connection to the Coordinator, if any """
+		if self.connection is not None:
+			self.connection[0].close()
+			self.connection = None
+
+
+class SweepApp:
+	def __init__(self, argc, argv):
+		# Command line arguments
+		if argc < 2 or argv[1] not in ("coordinator", "worker"):
+			self._print_usage(argv)
+			exit()
+		self.mode = argv[1]
+		if self.mode == "coordinator" and argc in (4, 5):
+			self.journal_path = argv[2]
+			self.port = int(argv[3])
+			self.jobs_path = argv[4] if argc == 5 else None
+		elif self.mode == "worker" and argc == 4:
+			self.host = argv[2]
+			self.port = int(argv[3])
+		else:
+			self._print_usage(argv)
+			exit()
+		self.queue = None
+		self.coordinator = None
+		self.worker = None
+
+	def _print_usage(self, argv):
+		""" Print command line argument info to standard output """
+		print "usage: python %s coordinator journal port [jobs.json]" % argv[0]
+		print "       python %s worker host port" % argv[0]
+		print "jobs.json holds a list of {\"params\": {...}, \"seed\": n, " \
+			  "\"generations\": n}"
+
+	def on_init(self):
+		""" Open the job queue and start serving, or connect as a worker """
+		if self.mode == "coordinator":
+			self.queue = JobQueue(self.journal_path)
+			if self.jobs_path is not None:
+				with open(self.jobs_path) as f:
+					for job in json.load(f):
+						self.queue.add(job.get("params", {}), job["seed"],
+									   job["generations"])
+			self.coordinator = Coordinator(self.queue, self.port)
+			self.coordinator.start()
+			print "coordinator: %d jobs, %d finished, port %d" % (
+				len(self.queue.jobs), len(self.queue.finished),
+				self.coordinator.port)
+		else:
+			self.worker = Worker(self.host, self.port)
+
+	def on_execute(self):
+		""" Run until every job is finished """
+		if self.mode == "coordinator":
+			while not self.queue.is_finished():
+				time.sleep(0.5)
+			# Give idle workers a chance to hear that the sweep is over
+			time.sleep(Coordinator._WAIT_SECONDS * 2)
+		else:
+			self.worker.run()
+
+	def on_exit(self):
+		""" Output the results of every job """
+		if self.mode == "worker":
+			print "worker %s: ran %d jobs" % (self.worker.name,
+											  self.worker.jobs_run)
+			return
+		self.coordinator.stop()
+		print "---> Sweep results"
+		for id_ in self.queue.order:
+			job = self.queue.jobs[id_]
+			results = self.queue.get_results(id_)
+			print "%s  seed=%s  params=%s" % (id_, job["seed"],
+											   json.dumps(job["params"],
+														  sort_keys=True))
+			print "    Lifetimes:  [%s]" % ','.join([str(x) for x in
+													  results["lifetime"]])
+			print "    C-C events: [%s]" % ','.join([str(x) for x in
+													  results["cc"]])
+		self.queue.close()
+
+
+if __name__ == "__main__" :
+	app_instance = SweepApp(len(sys.argv), sys.argv)
+	app_instance.on_init()
+	app_instance.on_execute()
+	app_instance.on_exit()
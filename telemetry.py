@@ -0,0 +1,156 @@
+import array
+
+
+class TimeSeries:
+	"""
+	Fixed-capacity history of a value sampled every tick, kept at several
+	resolutions. Level 0 holds the latest capacity samples; every further
+	level holds averages of factor consecutive entries of the level below, so
+	it reaches factor times as far back. All storage is preallocated and
+	append() takes constant time (amortized over the coarser levels)
+	"""
+	def __init__(self, capacity=256, levels=4, factor=8):
+		self.capacity = capacity
+		self.levels = levels
+		self.factor = factor
+		self.buffers = [array.array("d", [0.0]) * capacity
+						for level in range(levels)]
+		# Index of the next write and number of entries held per level
+		self.heads = [0] * levels
+		self.counts = [0] * levels
+		# Running sum and count of entries not yet averaged into each level
+		self.sums = [0.0] * levels
+		self.pending = [0] * levels
+		self.total = 0
+
+	def append(self, value):
+		""" Add the sample of one tick """
+		self.total += 1
+		level = 0
+		while True:
+			head = self.heads[level]
+			self.buffers[level][head] = value
+			self.heads[level] = (head + 1) % self.capacity
+			if self.counts[level] < self.capacity:
+				self.counts[level] += 1
+			level += 1
+			if level == self.levels:
+				break
+			self.sums[level] += value
+			self.pending[level] += 1
+			if self.pending[level] < self.factor:
+				break
+			value = self.sums[level] / self.factor
+			self.sums[level] = 0.0
+			self.pending[level] = 0
+
+	def get(self, level=0):
+		""" Return a list of the entries held at a level, oldest first """
+		count = self.counts[level]
+		head = self.heads[level]
+		buffer = self.buffers[level]
+		start = head - count
+		if start >= 0:
+			return buffer[start:head].tolist()
+		return buffer[start:].tolist() + buffer[:head].tolist()
+
+	def get_last(self):
+		""" Return the latest sample, or 0.0 if there is none """
+		if self.total == 0:
+			return 0.0
+		return self.buffers[0][self.heads[0] - 1]
+
+	def get_span(self, level):
+		""" Number of ticks averaged into each entry of a level """
+		return self.factor ** level
+
+	def get_range(self, level):
+		"""
+		Return (first, last), the ticks covered by the entries held at a
+		level, counting from 1 at the first sample, or None if it holds none.
+		Coarse levels only hold complete averages, so they can end before
+		the latest tick
+		"""
+		count = self.counts[level]
+		if count == 0:
+			return None
+		span = self.get_span(level)
+		last = (self.total // span) * span
+		return (last - count * span + 1, last)
+
+	def __len__(self):
+		return self.total
+
+
+class Telemetry:
+	"""
+	Per-tick statistics of the living Agents of a Model, each kept in a
+	TimeSeries: mean and minimum health, number alive, attack rate (fraction
+	of the tick's new interactions in which an Agent attacked), and mean
+	forward force
+	"""
+	NAMES = ["health_mean", "health_min", "alive", "attack_rate",
+			 "forward_force_mean"]
+
+	def __init__(self, capacity=256, levels=4, factor=8):
+		self.series = dict([(name, TimeSeries(capacity, levels, factor))
+							for name in Telemetry.NAMES])
+
+	def record(self, agents, attacks, interactions):
+		"""
+		Sample one tick given the Agents of a Model and how many Agents
+		attacked out of those that took part in a new interaction
+		"""
+		health = [agent.health for agent in agents if agent.is_alive()]
+		alive = len(health)
+		series = self.series
+		if alive > 0:
+			force = sum([agent.forward_force for agent in agents
+						 if agent.is_alive()])
+			series["health_mean"].append(sum(health) / float(alive))
+			series["health_min"].append(float(min(health)))
+			series["forward_force_mean"].append(force / float(alive))
+		else:
+			series["health_mean"].append(0.0)
+			series["health_min"].append(0.0)
+			series["forward_force_mean"].append(0.0)
+		series["alive"].append(float(alive))
+		if interactions > 0:
+			series["attack_rate"].append(attacks / float(interactions))
+		else:
+			series["attack_rate"].append(0.0)
+
+	def get(self, name, level=0):
+		""" Return the entries of one statistic at a level, oldest first """
+		return self.series[name].get(level)
+
+	def report(self):
+		"""
+		Return a human-readable table with the latest value of every statistic
+		and its average over the ticks held at each level, labelled with the
+		range of ticks since recording started. Levels that reach no further
+		back than the level below are left out
+		"""
+		any_series = self.series[Telemetry.NAMES[0]]
+		if len(any_series) == 0:
+			return "No telemetry samples"
+		ranges = []
+		for level in range(any_series.levels):
+			covered = any_series.get_range(level)
+			if covered is None:
+				break
+			if len(ranges) == 0 or covered[0] < ranges[-1][1][0]:
+				ranges.append((level, covered))
+		labels = ["avg ticks %d-%d" % covered for level, covered in ranges]
+		width = max([12] + [len(label) for label in labels])
+		lines = ["%-20s %10s" % ("statistic", "last") + "".join(
+				 ["  %*s" % (width, label) for label in labels])]
+		for name in Telemetry.NAMES:
+			series = self.series[name]
+			averages = []
+			for level, covered in ranges:
+				values = series.get(level)
+				averages.append(sum(values) / len(values))
+			lines.append("%-20s %10.3f" % (name, series.get_last()) + "".join(
+						 ["  %*.3f" % (width, value) for value in averages]))
+		return "\n".join(lines)
@@ -0,0 +1,180 @@
+import model
+import sys
+import time
+
+
+# Engines by name. Each is a function (size, params, seed) returning a tuple
+# (step, world): step() advances the engine by one tick and world is the
+# Model-like object whose agents are traced
+ENGINES = {}
+
+
+def register_engine(name, factory):
+	""" Make an engine available for comparison against the reference """
+	ENGINES[name] = factory
+
+
+def _reference_engine(size, params, seed):
+	world = model.Model(size, params, seed)
+	return world.on_tick, world
+
+
+def _sync_sight_engine(size, params, seed):
+	params = dict(params, _SYNC_SIGHT=True)
+	world = model.Model(size, params, seed)
+	return world.on_tick, world
+
+
+def _brain_cache_engine(size, params, seed):
+	params = dict(params, _BRAIN_CACHE_SIZE=256, _BRAIN_CACHE_QUANTUM=0.0)
+	world = model.Model(size, params, seed)
+	return world.on_tick, world
+
+
+def _quantized_brain_cache_engine(size, params, seed):
+	params = dict(params, _BRAIN_CACHE_SIZE=256)
+	world = model.Model(size, params, seed)
+	return world.on_tick, world
+
+
+register_engine("reference", _reference_engine)
+register_engine("sync_sight", _sync_sight_engine)
+register_engine("brain_cache", _brain_cache_engine)
+register_engine("brain_cache_quantized", _quantized_brain_cache_engine)
+
+
+def capture_frame(world):
+	"""
+	Return a compact record of the state of a world after a tick:
+	(generation, tick, cc, cd, dd, agents) where agents holds a tuple
+	(x, y, radians, health, attacked, partner, neuron energies) per Agent and
+	partner is the list index of the previous interaction partner or -1
+	"""
+	agents = world.agents
+	index = dict([(id(agent), i) for i, agent in enumerate(agents)])
+	states = []
+	for agent in agents:
+		partner = agent.prev_interact_agent
+		partner = -1 if partner is None else index.get(id(partner), -1)
+		energies = tuple([n.energy for n in agent.brain.neurons])
+		states.append((agent.x, agent.y, agent.radians, agent.health,
+					   agent.interact_attacked, partner, energies))
+	generation = world.generation
+	return (generation, world.tick, world._log_cc[generation],
+			world._log_cd[generation], world._log_dd[generation],
+			tuple(states))
+
+
+def record_trace(engine, size, params, seed, ticks):
+	"""
+	Run an engine for a number of ticks and return a tuple (frames, seconds)
+	where seconds is the time spent stepping, excluding tracing
+	"""
+	step, world = ENGINES[engine](size, params, seed)
+	frames = []
+	seconds = 0.0
+	for i in range(ticks):
+		start = time.time()
+		step()
+		seconds += time.time() - start
+		frames.append(capture_frame(world))
+	return (frames, seconds)
+
+
+def find_divergence(reference, frames, position_tol=1e-9, health_tol=1e-9,
+					energy_tol=1e-9):
+	"""
+	Compare two traces and return a description of the first difference, or
+	None if they match within the float tolerances. Everything that isn't a
+	position, heading, health, or Neuron energy must match exactly
+	"""
+	for step, (expected, actual) in enumerate(zip(reference, frames)):
+		where = "step %d (generation %d, tick %d)" % (step + 1, expected[0],
+													 expected[1])
+		names = ["generation", "tick", "C-C events", "C-D events",
+				 "D-D events"]
+		for name, a, b in zip(names, expected[:5], actual[:5]):
+			if a != b:
+				return "%s: %s %s != %s" % (where, name, a, b)
+		if len(expected[5]) != len(actual[5]):
+			return "%s: Agent count %d != %d" % (where, len(expected[5]),
+												 len(actual[5]))
+		for i, (a, b) in enumerate(zip(expected[5], actual[5])):
+			checks = [("x", a[0], b[0], position_tol),
+					  ("y", a[1], b[1], position_tol),
+					  ("heading", a[2], b[2], position_tol),
+					  ("health", a[3], b[3], health_tol)]
+			checks += [("neuron %d energy" % k, ea, eb, energy_tol)
+					   for k, (ea, eb) in enumerate(zip(a[6], b[6]))]
+			for name, va, vb, tol in checks:
+				if abs(va - vb) > tol:
+					return "%s: Agent %d %s %r != %r" % (where, i, name, va, vb)
+			if a[4] != b[4]:
+				return "%s: Agent %d attacked %s != %s" % (where, i, a[4], b[4])
+			if a[5] != b[5]:
+				return "%s: Agent %d partner %d != %d" % (where, i, a[5], b[5])
+	if len(reference) != len(frames):
+		return "trace length %d != %d" % (len(reference), len(frames))
+	return None
+
+
+class TraceApp:
+	# Absolute tolerance for positions and headings, health, and energies
+	_POSITION_TOL = 1e-9
+	_HEALTH_TOL = 1e-9
+	_ENERGY_TOL = 1e-9
+
+	def __init__(self, argc, argv):
+		# Command line arguments
+		if argc < 3 or int(argv[1]) <= 0:
+			self._print_usage(argv)
+			exit()
+		self.ticks = int(argv[1])
+		self.seed = int(argv[2])
+		self.engines = argv[3:] or sorted(set(ENGINES) - set(["reference"]))
+		for name in self.engines:
+			if name not in ENGINES:
+				self._print_usage(argv)
+				exit()
+		self.size = (1024, 768)
+		self.reference = None
+		self.reference_seconds = 0.0
+		# List of (engine, divergence or None, speedup)
+		self.results = []
+
+	def _print_usage(self, argv):
+		""" Print command line argument info to standard output """
+		print "usage: python %s ticks seed [engine ...]" % argv[0]
+		print "engines: %s" % ", ".join(sorted(ENGINES))
+
+	def on_init(self):
+		""" Record the golden trace with the reference implementation """
+		self.reference, self.reference_seconds = record_trace("reference",
+			self.size, {}, self.seed, self.ticks)
+
+	def on_execute(self):
+		""" Replay the seed through every engine and compare to the reference """
+		for name in self.engines:
+			frames, seconds = record_trace(name, self.size, {}, self.seed,
+										   self.ticks)
+			divergence = find_divergence(self.reference, frames,
+										 TraceApp._POSITION_TOL,
+										 TraceApp._HEALTH_TOL,
+										 TraceApp._ENERGY_TOL)
+			speedup = self.reference_seconds / max(seconds, 1e-9)
+			self.results.append((name, divergence, speedup))
+
+	def on_exit(self):
+		""" Output how each engine compares """
+		print "---> Golden trace: %d ticks, seed %d, reference %.2fs" % (
+			self.ticks, self.seed, self.reference_seconds)
+		for name, divergence, speedup in self.results:
+			print "%-24s speedup %5.2fx  %s" % (name, speedup,
+				"matches" if divergence is None else "diverges at " + divergence)
+
+
+if __name__ == "__main__" :
+	app_instance = TraceApp(len(sys.argv), sys.argv)
+	app_instance.on_init()
+	app_instance.on_execute()
+	app_instance.on_exit()
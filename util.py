@@ -1,10 +1,20 @@
 import math
 import random
 
+# Source of pseudo-random numbers for rand(); swapped by each Model so that
+# every simulation draws from its own stream
+_random = random
+
+
+def set_random(generator):
+	""" Draw from generator (e.g. a random.Random) in all future rand() calls """
+	global _random
+	_random = generator
+
 
 def rand(low, high):
 	""" Return a continuous pseudo-random value between two values """
-	return low + (high - low) * random.random()
+	return low + (high - low) * _random.random()
 
 
 def dist(p1, p2):